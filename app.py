@@ -1,36 +1,273 @@
 import os
-from flask import Flask, request, jsonify, render_template_string, g
+from flask import Flask, request, jsonify, render_template, make_response, stream_with_context, g, url_for, has_request_context
 import requests
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from bson import ObjectId # ObjectId'leri string'e çevirmek için gerekebilir (şimdilik kullanılmıyor)
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DocumentTooLarge, DuplicateKeyError
+from pymongo import monitoring
+import gridfs
+from requests.adapters import HTTPAdapter
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from bson import Binary, ObjectId
+from bson.errors import InvalidId
+from werkzeug.exceptions import ClientDisconnected
 import datetime
+import asyncio
+import base64
+import collections
+import contextlib
+import email.utils
+import gzip
+import queue
+import hashlib
+import json
+import math
+import multiprocessing
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import brotli  # İsteğe bağlı: varsa ham JSON brotli ile sıkıştırılır
+except ImportError:
+    brotli = None
+
+try:
+    import ijson  # İsteğe bağlı: Index yanıtını bütünüyle belleğe almadan ayrıştırmak için
+except ImportError:
+    ijson = None
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# Ölçümler (Prometheus): aşama süreleri, istek/hata sayaçları, aktarılan baytlar.
+# /metrics uç noktasından Prometheus metin biçiminde okunur.
+SLOW_REQUEST_LOG_SECONDS = float(os.getenv('SLOW_REQUEST_LOG_SECONDS', '0'))  # 0: kapalı
+
+STAGE_SECONDS = Histogram(
+    'video_app_stage_seconds', 'İşlem aşamalarının süresi (sn)', ['stage'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+REQUEST_SECONDS = Histogram('video_app_request_seconds', 'HTTP isteklerinin süresi (sn)', ['endpoint', 'method'])
+REQUESTS_TOTAL = Counter('video_app_requests_total', 'HTTP istekleri', ['endpoint', 'method', 'status'])
+ERRORS_TOTAL = Counter('video_app_errors_total', 'Nedenine göre hatalar', ['cause'])
+PAYLOAD_BYTES = Counter('video_app_payload_bytes_total', 'Aktarılan veri (bayt)', ['kind'])
+UPLOADS_IN_FLIGHT = Gauge('video_app_uploads_in_flight', "Şu anda Azure'a gönderilen yüklemeler")
+
+@contextlib.contextmanager
+def timed_stage(stage):
+    """Bloğun süresini aşama histogramına yazar; istek içindeyse istek dökümüne de ekler."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if has_request_context() and 'stage_seconds' in g:
+            g.stage_seconds[stage] = g.stage_seconds.get(stage, 0.0) + elapsed
+
+def record_error(cause):
+    ERRORS_TOTAL.labels(cause).inc()
+
+class _TokenStatsCollector:
+    """Token önbelleği sayaçlarını kayıt anında AccessTokenManager.stats()'tan okur."""
+
+    def collect(self):
+        stats = token_manager.stats()
+        for name in ('hits', 'misses', 'refreshes', 'refresh_failures'):
+            yield CounterMetricFamily(f'video_app_token_{name}', f'Access token önbelleği: {name}', value=stats[name])
+        yield GaugeMetricFamily('video_app_token_expires_in_seconds', 'Önbellekteki tokenın kalan süresi',
+                                value=stats['expires_in'])
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.stage_seconds = {}
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # Yol yerine kural ('/result/<video_id>') kullanılır; etiket sayısı sınırlı kalır
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.labels(endpoint, request.method).observe(elapsed)
+    REQUESTS_TOTAL.labels(endpoint, request.method, str(response.status_code)).inc()
+    if response.status_code >= 500:
+        record_error('http_5xx')
+    if request.content_length:
+        PAYLOAD_BYTES.labels('request_body').inc(request.content_length)
+    if SLOW_REQUEST_LOG_SECONDS and elapsed >= SLOW_REQUEST_LOG_SECONDS:
+        print(json.dumps({
+            'event': 'slow_request', 'method': request.method, 'path': request.path, 'endpoint': endpoint,
+            'status': response.status_code, 'seconds': round(elapsed, 4),
+            'stages': {stage: round(seconds, 4) for stage, seconds in g.stage_seconds.items()},
+        }, ensure_ascii=False))
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    response = make_response(generate_latest(REGISTRY))
+    response.headers['Content-Type'] = CONTENT_TYPE_LATEST
+    return response
+
 # MongoDB Ayarları
 MONGODB_URI = os.getenv('MONGODB_CONNECTION_STRING')
 MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME')
 
+# Devre kesici: MongoDB erişilemezken her istek 5 sn beklemek yerine hemen başarısız olur.
+MONGO_BREAKER_RESET_SECONDS = float(os.getenv('MONGO_BREAKER_RESET_SECONDS', '30'))
+# Erişilemeyen sunucuda bağlantı denemesinin (ve kesici açılmadan önceki ilk isteğin) en uzun bekleme süresi
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+
+class CircuitBreaker:
+    """closed -> (hata) -> open -> (reset süresi dolunca tek deneme) half_open -> closed/open"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, reset_seconds):
+        self._reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+
+    def allow_request(self):
+        """İstek yapılabilir mi? True dönen half_open çağrısı tek deneme hakkını alır."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self._reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def is_trial(self):
+        with self._lock:
+            return self.state == self.HALF_OPEN
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("MongoDB devre kesici kapandı, bağlantı tekrar kullanılabilir.")
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            if self.state != self.OPEN:
+                print(f"MongoDB devre kesici açıldı, {self._reset_seconds:.0f} sn boyunca istekler hemen reddedilecek.")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+mongo_breaker = CircuitBreaker(MONGO_BREAKER_RESET_SECONDS)
+
+class _MongoTopologyListener(monitoring.TopologyListener):
+    """pymongo'nun izleme thread'i yazılabilir sunucuyu kaybedince/bulunca devre kesiciyi günceller."""
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        if event.new_description.has_writable_server():
+            mongo_breaker.record_success()
+        elif event.previous_description.has_writable_server():
+            mongo_breaker.record_failure()
+
+    def closed(self, event):
+        pass
+
 _mongo_client = None
 
 def get_mongo_client():
     global _mongo_client
+    if not mongo_breaker.allow_request():
+        return None
     if _mongo_client is None:
         if not MONGODB_URI:
             print("HATA: MONGODB_CONNECTION_STRING ortam değişkeni ayarlanmamış.")
             return None
         try:
-            _mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+            _mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                                        event_listeners=[_MongoTopologyListener()])
             _mongo_client.admin.command('ping') 
             print("MongoDB'ye başarıyla bağlandı!")
+            mongo_breaker.record_success()
+            ensure_indexes(_mongo_client)
         except Exception as e:
             print(f"MongoDB bağlantı hatası: {e}")
+            mongo_breaker.record_failure()
+            if _mongo_client is not None:
+                _mongo_client.close()
             _mongo_client = None
+    elif mongo_breaker.is_trial():
+        # Kesici yarı açık: bu isteği deneme olarak kullan
+        try:
+            _mongo_client.admin.command('ping')
+            mongo_breaker.record_success()
+        except Exception as e:
+            print(f"MongoDB bağlantı hatası: {e}")
+            mongo_breaker.record_failure()
+            return None
     return _mongo_client
 
+# (collection, anahtarlar, create_index seçenekleri)
+APP_INDEXES = [
+    ('results', 'video_id', {'unique': True}),
+    ('upload_jobs', [('status', 1), ('next_attempt_at', 1)], {}),
+    # Tekilleştirme: aynı içerik için aynı anda tek bir aktif iş, tek bir video kaydı
+    ('upload_jobs', 'active_hash', {'unique': True, 'partialFilterExpression': {'active_hash': {'$type': 'string'}}}),
+    ('upload_jobs', [('content_hash', 1), ('created_at', -1)],
+     {'partialFilterExpression': {'content_hash': {'$type': 'string'}}}),
+    ('videos', 'content_hash', {'unique': True, 'partialFilterExpression': {'content_hash': {'$type': 'string'}}}),
+    ('chunked_uploads', 'created_at', {}),
+    ('chunked_uploads', [('status', 1), ('updated_at', 1)], {}),
+    ('videos', [('status', 1), ('next_poll_at', 1)], {}),
+    # Ana sayfa listelemesi: upload_date/_id üzerinde cursor sayfalama, durum ve dosya adı filtreleri.
+    # Dosya adı öneki bir aralık sorgusudur; filename ile başlayan indeks upload_date/_id sıralamasını
+    # veremez (bellekte sıralama gerekir). Bu yüzden filename sıralama alanlarından sonra da eklenir:
+    # sıralı taranırken önek indeks anahtarında elenir, doküman okunmaz ve limit+1 eşleşmede durulur.
+    # Seçici önekler için filename ile başlayan indeks kalır; planlayıcı ikisinden hızlı olanı seçer.
+    ('videos', [('upload_date', -1), ('_id', -1), ('filename', 1)], {}),
+    ('videos', [('status', 1), ('upload_date', -1), ('_id', -1), ('filename', 1)], {}),
+    ('videos', [('filename', 1), ('upload_date', -1), ('_id', -1)], {}),
+    ('videos', 'video_id', {}),
+    # Arama: metin indeksi (kök bulma yok, Türkçe ve İngilizce terimler olduğu gibi eşleşir)
+    ('search_terms', [('text', 'text')], {'default_language': 'none', 'language_override': 'search_language'}),
+    ('search_terms', 'video_id', {}),
+    # Canlı yayın: oturumlar ve oturuma bağlı segment işleri/videoları
+    ('live_sessions', [('status', 1), ('updated_at', 1)], {}),
+    ('upload_jobs', 'session_id', {'sparse': True}),
+    ('videos', [('session_id', 1), ('segment_index', 1)], {'sparse': True}),
+]
+
+def ensure_indexes(client):
+    """Uygulamanın kullandığı indeksleri oluşturur (zaten varsa MongoDB bir şey yapmaz).
+
+    Her indeks ayrı denenir; biri oluşturulamazsa (ör. aynı adla farklı seçenekler) diğerleri yine oluşturulur.
+    """
+    if not MONGODB_DB_NAME:
+        return
+    db = client[MONGODB_DB_NAME]
+    for collection_name, keys, options in APP_INDEXES:
+        try:
+            db[collection_name].create_index(keys, **options)
+        except Exception as e:
+            print(f"MongoDB indeks oluşturma hatası ({collection_name} {keys}): {e}")
+
 def get_db_collection(collection_name='videos'):
     client = get_mongo_client()
     if client and MONGODB_DB_NAME:
@@ -43,87 +280,1718 @@ SUBSCRIPTION_KEY = os.getenv('VIDEO_INDEXER_SUBSCRIPTION_KEY')
 LOCATION = os.getenv('VIDEO_INDEXER_LOCATION')
 ACCOUNT_ID = os.getenv('VIDEO_INDEXER_ACCOUNT_ID')
 
-# Access Token Al
-def get_access_token():
-    if not all([SUBSCRIPTION_KEY, LOCATION, ACCOUNT_ID]):
-        print("HATA: Azure Video Indexer yapılandırma anahtarları eksik.")
+# Video Indexer API adresi (yerel stub sunucu ile test için değiştirilebilir, bkz. stub_indexer.py)
+VIDEO_INDEXER_API_URL = os.getenv('VIDEO_INDEXER_API_URL', 'https://api.videoindexer.ai').rstrip('/')
+VIDEO_INDEXER_POOL_SIZE = int(os.getenv('VIDEO_INDEXER_POOL_SIZE', '10'))
+VIDEO_INDEXER_MAX_RETRIES = int(os.getenv('VIDEO_INDEXER_MAX_RETRIES', '3'))
+VIDEO_INDEXER_RETRY_BASE_SECONDS = float(os.getenv('VIDEO_INDEXER_RETRY_BASE_SECONDS', '0.5'))
+VIDEO_INDEXER_RETRY_MAX_SECONDS = float(os.getenv('VIDEO_INDEXER_RETRY_MAX_SECONDS', '30'))
+# İstemci tarafı hız sınırı: tüm Azure çağrıları için saniyede en fazla bu kadar istek
+VIDEO_INDEXER_RATE_PER_SECOND = float(os.getenv('VIDEO_INDEXER_RATE_PER_SECOND', '10'))
+
+# Token ömrü ve ne kadar erken yenileneceği (saniye). Azure token'ları genellikle 1 saat geçerlidir.
+TOKEN_TTL_SECONDS = int(os.getenv('VIDEO_INDEXER_TOKEN_TTL_SECONDS', '3600'))
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('VIDEO_INDEXER_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+
+class RateLimiter:
+    """Basit token bucket: saniyede `rate` izin, en fazla `burst` birikir. acquire() izin gelene kadar bekler."""
+
+    def __init__(self, rate, burst=1):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+def _parse_retry_after(value):
+    """Retry-After başlığını (saniye veya HTTP tarihi) saniyeye çevirir."""
+    if not value:
         return None
-    url = f"https://api.videoindexer.ai/Auth/{LOCATION}/Accounts/{ACCOUNT_ID}/AccessToken?allowEdit=true"
-    headers = {"Ocp-Apim-Subscription-Key": SUBSCRIPTION_KEY}
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class VideoIndexerClient:
+    """Azure Video Indexer için paylaşılan, keep-alive bağlantı havuzlu HTTP istemcisi.
+
+    Geçici hataları (bağlantı hataları, 5xx, 429) rastgele sapmalı üstel geri çekilmeyle
+    tekrar dener. 429 yanıtındaki Retry-After süresi boyunca tüm çağrılar bekletilir.
+    Hata durumunda requests.exceptions.RequestException fırlatır.
+    """
+
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url, location, account_id, subscription_key,
+                 pool_size=VIDEO_INDEXER_POOL_SIZE, max_retries=VIDEO_INDEXER_MAX_RETRIES,
+                 rate_per_second=VIDEO_INDEXER_RATE_PER_SECOND):
+        self.base_url = base_url
+        self.location = location
+        self.account_id = account_id
+        self.subscription_key = subscription_key
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._limiter = RateLimiter(rate_per_second, burst=max(1, int(rate_per_second)))
+        self._paused_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    def is_configured(self):
+        return all([self.subscription_key, self.location, self.account_id])
+
+    def _backoff(self, attempt):
+        delay = min(VIDEO_INDEXER_RETRY_MAX_SECONDS, VIDEO_INDEXER_RETRY_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_for_slot(self):
+        with self._pause_lock:
+            wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._limiter.acquire()
+
+    def request(self, method, path, idempotent=True, **kwargs):
+        """İsteği yapar ve son yanıtı döndürür. idempotent=False ise sadece 429 ve bağlantı
+        kurulamadan oluşan hatalar tekrar denenir (ör. video yükleme iki kez oluşmasın)."""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                if last_attempt:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt or not idempotent:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in self.RETRY_STATUS_CODES or last_attempt:
+                return response
+            if response.status_code != 429 and not idempotent:
+                return response
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if response.status_code == 429:
+                print(f"Azure hız sınırına takıldı (429), {delay:.1f} sn bekleniyor.")
+                self._pause(delay)
+            else:
+                time.sleep(delay)
+            response.close()
+        return response
+
+    def get_access_token(self):
+        response = self.request(
+            'GET', f"/Auth/{self.location}/Accounts/{self.account_id}/AccessToken",
+            params={'allowEdit': 'true'},
+            headers={'Ocp-Apim-Subscription-Key': self.subscription_key}, timeout=10)
         response.raise_for_status()
         return response.text.replace('"', '')
+
+    def upload_video(self, access_token, body, filename):
+        params = {'accessToken': access_token, 'name': filename, 'privacy': 'Private', 'videoUrl': ''}
+        return self.request(
+            'POST', f"/{self.location}/Accounts/{self.account_id}/Videos", idempotent=False,
+            params=params, data=body, headers={'Content-Type': body.content_type}, timeout=30)
+
+    def get_video_index(self, access_token, video_id, **kwargs):
+        return self.request(
+            'GET', f"/{self.location}/Accounts/{self.account_id}/Videos/{video_id}/Index",
+            params={'accessToken': access_token}, timeout=20, **kwargs)
+
+indexer_client = VideoIndexerClient(VIDEO_INDEXER_API_URL, LOCATION, ACCOUNT_ID, SUBSCRIPTION_KEY)
+
+# Access Token Al (Azure'a doğrudan istek, önbelleksiz)
+def fetch_access_token():
+    if not indexer_client.is_configured():
+        print("HATA: Azure Video Indexer yapılandırma anahtarları eksik.")
+        return None
+    try:
+        return indexer_client.get_access_token()
     except requests.exceptions.RequestException as e:
         print(f"Azure token alma hatası: {e}")
         return None
 
-@app.route('/upload', methods=['POST'])
-def upload_video_route():
-    if 'video' not in request.files:
-        return jsonify({'error': 'Video dosyası gerekli'}), 400
-    video_file = request.files['video']
-    
+def _token_expiry_from_jwt(token):
+    """Token bir JWT ise 'exp' alanından bitiş zamanını (epoch saniye) döndürür, değilse None."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+class AccessTokenManager:
+    """Access token'ı bitişine kadar önbellekte tutar ve bitmeden önce arka planda yeniler.
+
+    Aynı anda gelen istekler, devam eden tek bir yenilemeyi bekler; her biri ayrı
+    bir Azure isteği başlatmaz.
+    """
+
+    def __init__(self, fetch_func, ttl_seconds=TOKEN_TTL_SECONDS, refresh_margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS):
+        self._fetch = fetch_func
+        self._ttl = ttl_seconds
+        self._margin = refresh_margin_seconds
+        self._cond = threading.Condition()
+        self._token = None
+        self._expires_at = 0.0  # time.time() cinsinden
+        self._refreshing = False
+        self._timer = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _is_valid(self, now):
+        return self._token is not None and now < self._expires_at
+
+    def _is_fresh(self, now):
+        return self._token is not None and now < self._expires_at - self._margin
+
+    def get_token(self):
+        with self._cond:
+            now = time.time()
+            if self._is_fresh(now):
+                self.hits += 1
+                return self._token
+            if self._is_valid(now):
+                # Token hâlâ geçerli ama bitişe yakın: mevcut token'ı ver, yenilemeyi arka plana bırak.
+                self.hits += 1
+                self._start_background_refresh_locked()
+                return self._token
+            self.misses += 1
+            if self._refreshing:
+                # Başka bir istek zaten yeniliyor, onun sonucunu bekle.
+                while self._refreshing:
+                    self._cond.wait()
+                return self._token if self._is_valid(time.time()) else None
+            self._refreshing = True
+        return self._refresh()
+
+    def _start_background_refresh_locked(self):
+        if self._refreshing:
+            return
+        self._refreshing = True
+        threading.Thread(target=self._refresh, name='token-refresh', daemon=True).start()
+
+    def _refresh(self):
+        token = None
+        try:
+            token = self._fetch()
+        finally:
+            with self._cond:
+                if token:
+                    now = time.time()
+                    expires_at = _token_expiry_from_jwt(token) or (now + self._ttl)
+                    self._token = token
+                    self._expires_at = expires_at
+                    self.refreshes += 1
+                    self._schedule_refresh_locked(expires_at - self._margin - now)
+                else:
+                    self.refresh_failures += 1
+                self._refreshing = False
+                self._cond.notify_all()
+        return token if token else (self._token if self._is_valid(time.time()) else None)
+
+    def _schedule_refresh_locked(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay, 1.0), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._cond:
+            self._timer = None
+            self._start_background_refresh_locked()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures,
+                'expires_in': max(0, int(self._expires_at - time.time())) if self._token else 0,
+            }
+
+token_manager = AccessTokenManager(fetch_access_token)
+REGISTRY.register(_TokenStatsCollector())
+
+# Access Token Al (önbellekten)
+def get_access_token():
+    with timed_stage('token'):
+        token = token_manager.get_token()
+    if not token:
+        record_error('azure_auth')
+    return token
+
+@app.route('/token/stats', methods=['GET'])
+def token_stats():
+    return jsonify(token_manager.stats())
+
+# Canlı durum güncellemeleri (SSE)
+# Bağlantılar WSGI thread havuzunda değil, SSE_PORT'ta dinleyen tek thread'lik bir asyncio sunucusunda
+# tutulur; boşta bekleyen bir istemci sadece bir soket ve bir kuyruk harcar. SSE_PORT=0 ise olaylar
+# WSGI üzerindeki /events'ten verilir; orada her bağlantı bir thread tuttuğu için sayıları SERVER_THREADS'in
+# (waitress-serve --threads ile aynı; waitress varsayılanı 4) yarısıyla sınırlıdır.
+SSE_PORT = int(os.getenv('SSE_PORT', '5001'))
+SSE_HOST = os.getenv('SSE_HOST', '0.0.0.0')
+# Ters vekil arkasında tarayıcının bağlanacağı adres (ör. https://ornek.com/events); boşsa sayfanın
+# host'u ve SSE_PORT kullanılır.
+SSE_PUBLIC_URL = os.getenv('SSE_PUBLIC_URL', '')
+SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', '1000'))
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))
+SSE_WSGI_MAX_CLIENTS = int(os.getenv('SSE_WSGI_MAX_CLIENTS', str(max(1, SERVER_THREADS // 2))))
+SSE_FALLBACK_POLL_SECONDS = float(os.getenv('SSE_FALLBACK_POLL_SECONDS', '15'))
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '20'))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv('SSE_CLIENT_QUEUE_SIZE', '100'))
+# 1 ise güncellemeler MongoDB change stream'inden okunur (replica set gerekir, ör. Atlas);
+# böylece birden fazla süreçte çalışırken diğer süreçlerin yazdıkları da istemcilere ulaşır.
+SSE_USE_CHANGE_STREAM = os.getenv('SSE_USE_CHANGE_STREAM', '0') == '1'
+
+class VideoEventBroker:
+    """Süreç içi yayın/abone: durum yazan kod publish() çağırır, her SSE bağlantısı kendi kuyruğunu dinler."""
+
+    def __init__(self, max_clients=SSE_MAX_CLIENTS, queue_size=SSE_CLIENT_QUEUE_SIZE):
+        self._max_clients = max_clients
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber=None):
+        """Yeni bir abone kuyruğu döndürür; istemci sınırı dolduysa None.
+
+        subscriber verilirse (put_nowait/get_nowait sunan herhangi bir kuyruk) o kaydedilir.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self._max_clients:
+                return None
+            if subscriber is None:
+                subscriber = queue.Queue(maxsize=self._queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Yavaş istemci: en eski olayı at, yenisini ekle
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+video_events = VideoEventBroker()
+_change_stream_active = False
+
+def video_event_payload(video):
+    """Bir video dokümanından tabloya gerekli alanları içeren olay üretir."""
+    payload = {key: video.get(key) for key in ('video_id', 'filename', 'status', 'processing_progress')
+               if key in video}
+    if isinstance(video.get('upload_date'), datetime.datetime):
+        payload['upload_date'] = video['upload_date'].strftime("%Y-%m-%d %H:%M:%S UTC")
+    return payload
+
+def publish_video_update(video):
+    """Durum yazıldıktan sonra değişen satırı bağlı istemcilere iletir.
+
+    Change stream açıksa olaylar oradan geldiği için burada bir şey yapılmaz.
+    """
+    if _change_stream_active:
+        return
+    video_events.publish(video_event_payload(video))
+
+# Yükleme kuyruğu ayarları
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_spool'))
+UPLOAD_WORKER_COUNT = int(os.getenv('UPLOAD_WORKER_COUNT', '2'))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('UPLOAD_MAX_ATTEMPTS', '5'))
+UPLOAD_RETRY_BASE_SECONDS = float(os.getenv('UPLOAD_RETRY_BASE_SECONDS', '5'))
+UPLOAD_RETRY_MAX_SECONDS = float(os.getenv('UPLOAD_RETRY_MAX_SECONDS', '300'))
+# Bir işçinin işi üzerinde tutabileceği süre; süre dolarsa (ör. süreç çöktüyse) iş başka bir işçiye geçer.
+UPLOAD_JOB_LEASE_SECONDS = float(os.getenv('UPLOAD_JOB_LEASE_SECONDS', '1800'))
+# İş sürerken kira bu aralıkla uzatılır; uzun yüklemeler/ön işlemeler kira süresini aşabilir.
+UPLOAD_JOB_HEARTBEAT_SECONDS = float(os.getenv('UPLOAD_JOB_HEARTBEAT_SECONDS', str(UPLOAD_JOB_LEASE_SECONDS / 3)))
+UPLOAD_JOB_POLL_SECONDS = float(os.getenv('UPLOAD_JOB_POLL_SECONDS', '5'))
+# Parçalı yükleme: istemcinin göndereceği parça boyutu, tek parçada kabul edilen üst sınır ve
+# dosyayı diske yazarken / Azure'a aktarırken bellekte tutulan blok boyutu (bellek tavanı).
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_BYTES = int(os.getenv('UPLOAD_MAX_CHUNK_BYTES', str(64 * 1024 * 1024)))
+UPLOAD_STREAM_BLOCK_SIZE = int(os.getenv('UPLOAD_STREAM_BLOCK_SIZE', str(1024 * 1024)))
+# Bir parça yazılırken oturum bu süreyle kilitlenir; aynı ofsete gelen ikinci istek (ör. zaman aşımından
+# sonra tekrar deneme) beklemeden 409 alır. Süre dolarsa (süreç çöktüyse) kilit kendiliğinden kalkar.
+UPLOAD_CHUNK_LEASE_SECONDS = float(os.getenv('UPLOAD_CHUNK_LEASE_SECONDS', '300'))
+# Bu kadar süredir parça gelmeyen açık parçalı yükleme oturumları ve spool dosyaları silinir
+UPLOAD_SESSION_TTL_SECONDS = float(os.getenv('UPLOAD_SESSION_TTL_SECONDS', str(24 * 3600)))
+
+# Ön işleme (isteğe bağlı): videolar Azure'a gönderilmeden önce ffmpeg ile analiz profiline
+# (çözünürlük, fps, bit hızı) indirgenir. Profile zaten uyan dosyalar olduğu gibi gönderilir.
+PREPROCESS_ENABLED = os.getenv('PREPROCESS_ENABLED', '0') == '1'
+PREPROCESS_MAX_HEIGHT = int(os.getenv('PREPROCESS_MAX_HEIGHT', '720'))
+PREPROCESS_MAX_FPS = float(os.getenv('PREPROCESS_MAX_FPS', '30'))
+PREPROCESS_VIDEO_BITRATE = int(os.getenv('PREPROCESS_VIDEO_BITRATE', '1500000'))
+PREPROCESS_AUDIO_BITRATE = int(os.getenv('PREPROCESS_AUDIO_BITRATE', '96000'))
+# Her ffmpeg tek thread ile çalışır; paralellik, ön işleme aşamasında aynı anda yürütülen iş sayısından
+# (varsayılan: CPU sayısı) gelir. Yükleme işçileri (UPLOAD_WORKER_COUNT) ön işlemeyi beklemez.
+PREPROCESS_WORKERS = int(os.getenv('PREPROCESS_WORKERS', str(os.cpu_count() or 1)))
+# Tek bir ffmpeg/ffprobe çağrısının üst sınırı. İş kirası beklerken de uzatıldığı için
+# UPLOAD_JOB_LEASE_SECONDS'tan uzun olabilir.
+PREPROCESS_TIMEOUT_SECONDS = float(os.getenv('PREPROCESS_TIMEOUT_SECONDS', '3600'))
+FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+FFPROBE_PATH = os.getenv('FFPROBE_PATH', 'ffprobe')
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_DONE = 'done'
+JOB_STATUS_FAILED = 'failed'
+
+# Ön işleme açıkken işler önce 'preprocess' aşamasında kuyruğa girer; bitince 'upload' aşamasına geçer.
+# Aşaması olmayan (eski) işler doğrudan yüklenir.
+JOB_STAGE_PREPROCESS = 'preprocess'
+JOB_STAGE_UPLOAD = 'upload'
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_upload_job_event = threading.Event()
+_preprocess_job_event = threading.Event()
+
+class StreamingMultipartBody:
+    """Tek dosyalık multipart/form-data gövdesini diskteki dosyadan blok blok üretir.
+
+    requests bu nesneyi Content-Length ile akış olarak gönderir; bellekte aynı anda en fazla
+    bir blok (UPLOAD_STREAM_BLOCK_SIZE) tutulur. Her iterasyonda dosya baştan açıldığı için
+    aynı gövde yeniden denemelerde tekrar kullanılabilir.
+    """
+
+    def __init__(self, path, field_name, filename, mimetype, block_size=UPLOAD_STREAM_BLOCK_SIZE):
+        self._path = path
+        self._block_size = block_size
+        boundary = uuid.uuid4().hex
+        safe_filename = (filename or 'video').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+        self._head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{safe_filename}"\r\n'
+            f'Content-Type: {mimetype or "application/octet-stream"}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{boundary}--\r\n'.encode('ascii')
+        self._length = len(self._head) + os.path.getsize(path) + len(self._tail)
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        yield self._head
+        with open(self._path, 'rb') as f:
+            while True:
+                block = f.read(self._block_size)
+                if not block:
+                    break
+                yield block
+        yield self._tail
+
+def upload_file_to_azure(path, filename, mimetype):
+    """Diskteki bir dosyayı Azure Video Indexer'a yükler. (video_id, hata_mesajı) döndürür."""
     access_token = get_access_token()
     if not access_token:
-        return jsonify({'error': 'Azure Video Indexer token alınamadı veya yapılandırma eksik.'}), 500
-        
-    upload_url = f"https://api.videoindexer.ai/{LOCATION}/Accounts/{ACCOUNT_ID}/Videos?accessToken={access_token}&name={video_file.filename}&privacy=Private&videoUrl="
-    files = {'file': (video_file.filename, video_file.stream, video_file.mimetype)}
-    
+        return None, 'Azure Video Indexer token alınamadı veya yapılandırma eksik.'
+
     try:
-        azure_response = requests.post(upload_url, files=files, timeout=30)
+        body = StreamingMultipartBody(path, 'file', filename, mimetype)
+        with UPLOADS_IN_FLIGHT.track_inprogress(), timed_stage('azure_upload'):
+            azure_response = indexer_client.upload_video(access_token, body, filename)
         azure_response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Azure'a yükleme sırasında ağ hatası: {e}")
-        return jsonify({"error": "Azure'a yükleme sırasında ağ hatası", "details": str(e)}), 500
+        record_error('azure_upload')
+        return None, f"Azure'a yükleme sırasında ağ hatası: {e}"
+    except OSError as e:
+        print(f"Yükleme dosyası okunamadı: {e}")
+        record_error('spool_io')
+        return None, f"Yükleme dosyası okunamadı: {e}"
 
     if azure_response.status_code != 200:
-        return jsonify({"error": "Azure'a yükleme başarısız oldu", "status_code": azure_response.status_code, "details": azure_response.text}), 500
-    
+        record_error('azure_upload')
+        return None, f"Azure'a yükleme başarısız oldu (HTTP {azure_response.status_code}): {azure_response.text}"
+    PAYLOAD_BYTES.labels('azure_upload').inc(len(body))
+
     video_data = azure_response.json()
     video_id_from_azure = video_data.get('id')
     if not video_id_from_azure:
-        return jsonify({'error': 'Azure yanıtından video ID alınamadı', 'details': video_data}), 500
-        
-    filename = video_file.filename
-    upload_date = datetime.datetime.utcnow()
+        return None, f"Azure yanıtından video ID alınamadı: {video_data}"
+    return video_id_from_azure, None
+
+def _retry_delay(attempts):
+    """Üstel geri çekilme + rastgele sapma (saniye)."""
+    delay = min(UPLOAD_RETRY_MAX_SECONDS, UPLOAD_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.5, 1.0)
+
+def _remove_spool_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def probe_video(path):
+    """ffprobe ile ilk video akışının yüksekliğini, fps'ini ve dosyanın toplam bit hızını okur."""
+    completed = subprocess.run(
+        [FFPROBE_PATH, '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height,avg_frame_rate,r_frame_rate:format=bit_rate,duration',
+         '-of', 'json', path],
+        capture_output=True, check=True, timeout=60)
+    info = json.loads(completed.stdout or b'{}')
+    streams = info.get('streams') or [{}]
+    stream, fmt = streams[0], info.get('format') or {}
+
+    def _fps(value):
+        try:
+            numerator, _, denominator = (value or '0/1').partition('/')
+            return float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            return 0.0
+
+    return {
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+        'fps': _fps(stream.get('avg_frame_rate')) or _fps(stream.get('r_frame_rate')),
+        'bit_rate': int(fmt['bit_rate']) if str(fmt.get('bit_rate', '')).isdigit() else None,
+        'duration': float(fmt['duration']) if fmt.get('duration') not in (None, 'N/A') else None,
+    }
+
+def fits_analysis_profile(probe):
+    """Dosya analiz profiline zaten uyuyorsa True (yeniden kodlamak boyutu düşürmez)."""
+    if not probe.get('height'):
+        return False
+    bit_rate_limit = (PREPROCESS_VIDEO_BITRATE + PREPROCESS_AUDIO_BITRATE) * 1.2
+    return (probe['height'] <= PREPROCESS_MAX_HEIGHT
+            and probe['fps'] <= PREPROCESS_MAX_FPS + 0.5
+            and probe['bit_rate'] is not None and probe['bit_rate'] <= bit_rate_limit)
+
+def preprocess_video(path, output_path):
+    """Dosyayı analiz profiline göre hazırlar. Süreç havuzunda çalışır; sonuç sözlüğü döndürür.
+
+    Profile uyan dosyalar için 'path' girdinin kendisidir; aksi halde output_path'e H.264/AAC MP4 yazılır.
+    """
+    started = time.perf_counter()
+    result = {'original_size': os.path.getsize(path), 'transcoded': False, 'path': path}
+    probe = probe_video(path)
+    result['probe_seconds'] = round(time.perf_counter() - started, 3)
+    result['original_height'] = probe['height']
+    result['original_fps'] = round(probe['fps'], 2)
+    if fits_analysis_profile(probe):
+        result['sent_size'] = result['original_size']
+        result['preprocess_seconds'] = result['probe_seconds']
+        return result
+
+    filters = []
+    if probe['height'] and probe['height'] > PREPROCESS_MAX_HEIGHT:
+        filters.append(f"scale=-2:{PREPROCESS_MAX_HEIGHT}")
+    if probe['fps'] > PREPROCESS_MAX_FPS:
+        filters.append(f"fps={PREPROCESS_MAX_FPS:g}")
+    command = [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-y', '-i', path, '-threads', '1',
+               '-map', '0:v:0', '-map', '0:a:0?']
+    if filters:
+        command += ['-vf', ','.join(filters)]
+    command += ['-c:v', 'libx264', '-preset', 'veryfast',
+                '-b:v', str(PREPROCESS_VIDEO_BITRATE), '-maxrate', str(PREPROCESS_VIDEO_BITRATE),
+                '-bufsize', str(PREPROCESS_VIDEO_BITRATE * 2),
+                '-c:a', 'aac', '-b:a', str(PREPROCESS_AUDIO_BITRATE),
+                '-movflags', '+faststart', '-f', 'mp4', output_path]
+    subprocess.run(command, capture_output=True, check=True, timeout=PREPROCESS_TIMEOUT_SECONDS)
+
+    sent_size = os.path.getsize(output_path)
+    if sent_size >= result['original_size']:
+        # Yeniden kodlama kazanç sağlamadı; orijinali gönder
+        os.remove(output_path)
+        sent_size = result['original_size']
+    else:
+        result.update(transcoded=True, path=output_path)
+    result['sent_size'] = sent_size
+    result['preprocess_seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+_preprocess_pool = None
+_preprocess_pool_lock = threading.Lock()
+
+def get_preprocess_pool():
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is None:
+            # 'spawn': çok thread'li süreçten fork etmek kilitleri kopyalayıp kilitlenmeye yol açabilir
+            _preprocess_pool = ProcessPoolExecutor(max_workers=max(PREPROCESS_WORKERS, 1),
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return _preprocess_pool
+
+def _reset_preprocess_pool():
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        _preprocess_pool = None
+
+def _preprocessed_path(spool_path):
+    return spool_path + '.analysis.mp4'
+
+def _wait_for_preprocess(future, lease):
+    """Ön işleme sonucunu bekler; beklerken iş başka bir işçiye geçerse None döndürür."""
+    while True:
+        try:
+            return future.result(timeout=UPLOAD_JOB_HEARTBEAT_SECONDS)
+        except FuturesTimeoutError:
+            # Kira JobLease tarafından uzatılıyor; yalnızca kaybedildiyse beklemeyi bırak
+            if lease is not None and lease.lost:
+                future.cancel()
+                return None
+
+def run_preprocess(job, lease=None):
+    """İşin dosyasını süreç havuzunda analiz profiline indirger ve sonuç sözlüğünü döndürür.
+
+    ffmpeg hata verirse (veya iş defalarca yarıda kaldıysa) orijinal dosyanın gönderileceğini belirten
+    bir sonuç döner. Beklerken iş kirası kaybedilirse None döner.
+    """
+    spool_path = job['spool_path']
+    try:
+        if job.get('attempts', 0) > UPLOAD_MAX_ATTEMPTS:
+            # Önceki denemeler kira dolmadan bitmedi (ör. ffmpeg süreci öldürüldü); tekrar kodlama
+            raise RuntimeError(f"ön işleme {job['attempts'] - 1} denemede tamamlanamadı")
+        with timed_stage('preprocess'):
+            future = get_preprocess_pool().submit(preprocess_video, spool_path, _preprocessed_path(spool_path))
+            preprocess = _wait_for_preprocess(future, lease)
+    except Exception as e:
+        print(f"Ön işleme başarısız, orijinal dosya gönderilecek: {e}")
+        record_error('preprocess')
+        if isinstance(e, BrokenProcessPool):
+            # Bir alt süreç öldü (ör. bellek yetersizliği); sonraki işler için havuzu yeniden kur
+            _reset_preprocess_pool()
+        original_size = _spooled_size(spool_path)
+        preprocess = {'original_size': original_size, 'sent_size': original_size, 'transcoded': False,
+                      'error': str(e)[-500:]}
+    if preprocess is None:
+        return None
+    preprocess.pop('path', None)
+    if preprocess['transcoded']:
+        print(f"Ön işleme: {preprocess['original_size']} -> {preprocess['sent_size']} bayt "
+              f"({preprocess['preprocess_seconds']} sn)")
+    return preprocess
+
+def process_preprocess_job(jobs_collection, job):
+    """Ön işleme aşamasındaki işi çalıştırır ve sonucu kaydedip işi yükleme kuyruğuna geçirir."""
+    with JobLease(jobs_collection, job) as lease:
+        preprocess = run_preprocess(job, lease)
+    if preprocess is None or lease.lost:
+        print(f"Yükleme işi {job['_id']} ön işleme sırasında başka bir işçiye geçti, sonuç yazılmadı.")
+        return
+    now = datetime.datetime.utcnow()
+    # Yükleme denemeleri ayrıca sayılır; ön işleme denemesi UPLOAD_MAX_ATTEMPTS'tan düşülmez
+    result = jobs_collection.update_one(lease.owner_filter(), {'$set': {
+        'stage': JOB_STAGE_UPLOAD, 'status': JOB_STATUS_QUEUED, 'preprocess': preprocess, 'attempts': 0,
+        'locked_until': None, 'next_attempt_at': now,
+    }})
+    if result.matched_count:
+        _upload_job_event.set()
+    else:
+        print(f"Yükleme işi {job['_id']} ön işleme sırasında başka bir işçiye geçti, sonuç yazılmadı.")
+
+def prepare_upload(job):
+    """İşin Azure'a gönderilecek dosyasını seçer: (yol, dosya_adı, mime_tipi) döndürür."""
+    preprocess = job.get('preprocess')
+    if preprocess and preprocess['transcoded'] and os.path.exists(_preprocessed_path(job['spool_path'])):
+        filename = os.path.splitext(job['filename'] or 'video')[0] + '.mp4'
+        return _preprocessed_path(job['spool_path']), filename, 'video/mp4'
+    return job['spool_path'], job['filename'], job['mimetype']
+
+def _remove_job_files(job):
+    _remove_spool_file(job['spool_path'])
+    _remove_spool_file(_preprocessed_path(job['spool_path']))
+
+def enqueue_upload_job(spool_path, filename, mimetype, content_hash=None, **extra):
+    """Diskteki dosya için kalıcı bir yükleme işi oluşturur ve işçileri uyandırır. İş dokümanını döndürür.
+
+    content_hash verilirse aynı içerik için zaten aktif (kuyrukta/çalışan) bir iş varsa yeni iş
+    oluşturulmaz; spool dosyası silinir ve mevcut iş döndürülür (istemci onu takip eder).
+    """
+    jobs_collection = get_db_collection('upload_jobs')
+    if jobs_collection is None:
+        return None
+    for _ in range(3):
+        now = datetime.datetime.utcnow()
+        job_document = {
+            'status': JOB_STATUS_QUEUED,
+            'stage': JOB_STAGE_PREPROCESS if PREPROCESS_ENABLED else JOB_STAGE_UPLOAD,
+            'spool_path': spool_path,
+            'filename': filename,
+            'mimetype': mimetype,
+            'attempts': 0,
+            'created_at': now,
+            'next_attempt_at': now,
+            'video_id': None,
+            'last_error': None,
+        }
+        if content_hash:
+            job_document['content_hash'] = content_hash
+            # Sadece iş aktifken tutulur; benzersiz indeks eşzamanlı kopyaların ikinci bir iş açmasını engeller
+            job_document['active_hash'] = content_hash
+        job_document.update(extra)
+        try:
+            with timed_stage('mongo_insert'):
+                jobs_collection.insert_one(job_document)
+        except DuplicateKeyError:
+            existing = jobs_collection.find_one({'content_hash': content_hash}, sort=[('created_at', -1)])
+            if existing is None or existing['status'] == JOB_STATUS_FAILED:
+                # Mevcut iş bu arada başarısız oldu; yeni iş olarak tekrar dene
+                continue
+            _remove_spool_file(spool_path)
+            print(f"Aynı içerik zaten yükleniyor, iş {existing['_id']} takip edilecek.")
+            return existing
+        (_preprocess_job_event if PREPROCESS_ENABLED else _upload_job_event).set()
+        return job_document
+    raise RuntimeError('Yükleme işi oluşturulamadı (aynı içerik için eşzamanlı işler)')
+
+def find_video_by_hash(content_hash):
+    """Aynı içerikle daha önce yüklenmiş videoyu döndürür (yoksa None).
 
+    Analizi başarısız olan ('Failed') videolar sayılmaz; aynı dosya tekrar yüklenebilir.
+    """
+    videos_collection = get_db_collection('videos')
+    if videos_collection is None or not content_hash:
+        return None
+    return videos_collection.find_one({'content_hash': content_hash, 'status': {'$ne': 'Failed'}},
+                                      {'video_id': 1, 'filename': 1, 'status': 1})
+
+def _claim_next_job(jobs_collection, stage=JOB_STAGE_UPLOAD):
+    now = datetime.datetime.utcnow()
+    if stage == JOB_STAGE_UPLOAD:
+        # Aşaması olmayan eski işler de yüklenir; ön işleme kapatıldıysa bekleyen ön işleme işleri de
+        stages = [JOB_STAGE_UPLOAD, None] + ([] if PREPROCESS_ENABLED else [JOB_STAGE_PREPROCESS])
+    else:
+        stages = [stage]
+    return jobs_collection.find_one_and_update(
+        {'stage': {'$in': stages}, '$or': [
+            {'status': JOB_STATUS_QUEUED, 'next_attempt_at': {'$lte': now}},
+            # Süresi dolmuş kiralar: işi alan süreç yeniden başlatılmış veya çökmüş olabilir
+            {'status': JOB_STATUS_RUNNING, 'locked_until': {'$lt': now}},
+        ]},
+        {'$set': {
+            'status': JOB_STATUS_RUNNING,
+            'worker': WORKER_ID,
+            # Aynı süreçteki işçiler WORKER_ID'yi paylaşır; kira her sahiplenmede ayrı kimlik alır
+            'lease_id': uuid.uuid4().hex,
+            'started_at': now,
+            'locked_until': now + datetime.timedelta(seconds=UPLOAD_JOB_LEASE_SECONDS),
+        }, '$inc': {'attempts': 1}},
+        sort=[('next_attempt_at', 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+class JobLease:
+    """with bloğu süresince işin kirasını arka planda UPLOAD_JOB_HEARTBEAT_SECONDS aralıkla uzatır.
+
+    Kira süresi dolup iş başka bir işçiye geçtiyse `lost` True olur; sonuç yazılmamalıdır.
+    """
+
+    def __init__(self, jobs_collection, job):
+        self.jobs_collection = jobs_collection
+        self.job = job
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def owner_filter(self):
+        return {'_id': self.job['_id'], 'worker': WORKER_ID, 'lease_id': self.job.get('lease_id')}
+
+    def renew(self):
+        result = self.jobs_collection.update_one(
+            dict(self.owner_filter(), status=JOB_STATUS_RUNNING),
+            {'$set': {'locked_until': datetime.datetime.utcnow() + datetime.timedelta(seconds=UPLOAD_JOB_LEASE_SECONDS)}})
+        if result.matched_count == 0:
+            self.lost = True
+        return not self.lost
+
+    def _run(self):
+        while not self._stop.wait(UPLOAD_JOB_HEARTBEAT_SECONDS):
+            try:
+                if not self.renew():
+                    print(f"Yükleme işi {self.job['_id']} başka bir işçiye geçti, kira uzatılmıyor.")
+                    return
+            except Exception as e:
+                # Geçici bağlantı hatası; kira dolmadan sonraki denemede uzatılır
+                print(f"Yükleme işi {self.job['_id']} kirası uzatılamadı: {e}")
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f"job-lease-{self.job['_id']}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+LIVE_SEGMENT_FIELDS = ('session_id', 'segment_index', 'segment_start_ms', 'segment_end_ms')
+
+def insert_video_document(job, video_id):
+    """Azure'a yüklenen video için 'videos' kaydını oluşturur (aynı video_id için tekrar eklemez).
+
+    Kaydın video_id'sini döndürür: aynı içerik bu arada başka bir işle kaydedildiyse mevcut video kullanılır.
+    """
+    videos_collection = get_db_collection('videos')
+    if videos_collection is None:
+        raise RuntimeError('Veritabanı bağlantısı/collection alınamadı')
+    video_document = {
+        'video_id': video_id,
+        'filename': job['filename'],
+        'upload_date': datetime.datetime.utcnow(),
+        'status': 'Uploaded'
+    }
+    # Canlı yayın segmentleri üst oturuma bağlanır
+    for key in LIVE_SEGMENT_FIELDS:
+        if job.get(key) is not None:
+            video_document[key] = job[key]
+    # Orijinal / gönderilen boyut ve ön işleme, yükleme süreleri
+    video_document.update(job.get('upload_stats') or {})
+    if job.get('content_hash'):
+        video_document['content_hash'] = job['content_hash']
+        # Aynı içerikli başarısız video hash'i bırakır; aksi halde tekil indeks yeni kaydı engellerdi
+        videos_collection.update_many({'content_hash': job['content_hash'], 'status': 'Failed'},
+                                      {'$unset': {'content_hash': ''}})
+    try:
+        with timed_stage('mongo_insert'):
+            result = videos_collection.update_one({'video_id': video_id}, {'$setOnInsert': video_document}, upsert=True)
+    except DuplicateKeyError:
+        # Yarış: bu iş kuyruğa alındıktan sonra aynı içerikli başka bir iş tamamlandı (veya kirası dolan
+        # iş iki işçide çalıştı). Yeni kayıt açılmaz, mevcut video kullanılır.
+        existing = find_video_by_hash(job.get('content_hash'))
+        if existing is None:
+            raise
+        print(f"Aynı içerik {existing['video_id']} olarak zaten kayıtlı, {video_id} kaydedilmedi.")
+        return existing['video_id']
+    print(f"MongoDB'ye eklendi, _id: {result.upserted_id}, video_id: {video_id}")
+    if result.upserted_id is not None:
+        publish_video_update(video_document)
+    return video_id
+
+def process_upload_job(jobs_collection, job):
+    with JobLease(jobs_collection, job) as lease:
+        error, video_id = _run_upload_job(jobs_collection, job, lease)
+
+    if lease.lost:
+        # İş kira süresi dolduğu için başka bir işçiye geçti; dosyalar ve sonuç artık onun
+        print(f"Yükleme işi {job['_id']} başka bir işçiye geçti, sonuç yazılmadı.")
+        return
+    now = datetime.datetime.utcnow()
+    owner_filter = lease.owner_filter()
+    if error is None:
+        result = jobs_collection.update_one(owner_filter, {'$set': {
+            'status': JOB_STATUS_DONE, 'finished_at': now, 'last_error': None, 'locked_until': None,
+        }, '$unset': {'active_hash': ''}})
+        if result.matched_count:
+            _remove_job_files(job)
+            print(f"Yükleme işi {job['_id']} tamamlandı, video_id: {video_id}")
+    elif job['attempts'] >= UPLOAD_MAX_ATTEMPTS:
+        result = jobs_collection.update_one(owner_filter, {'$set': {
+            'status': JOB_STATUS_FAILED, 'finished_at': now, 'last_error': error, 'locked_until': None,
+        }, '$unset': {'active_hash': ''}})
+        if result.matched_count:
+            _remove_job_files(job)
+            print(f"Yükleme işi {job['_id']} {job['attempts']} denemeden sonra başarısız oldu: {error}")
+    else:
+        delay = _retry_delay(job['attempts'])
+        result = jobs_collection.update_one(owner_filter, {'$set': {
+            'status': JOB_STATUS_QUEUED, 'last_error': error, 'locked_until': None,
+            'next_attempt_at': now + datetime.timedelta(seconds=delay),
+        }})
+        if result.matched_count:
+            print(f"Yükleme işi {job['_id']} {delay:.0f} sn sonra tekrar denenecek: {error}")
+    if not result.matched_count:
+        print(f"Yükleme işi {job['_id']} başka bir işçiye geçti, sonuç yazılmadı.")
+
+def _run_upload_job(jobs_collection, job, lease):
+    """İşi Azure'a yükler ve video kaydını oluşturur: (hata, video_id) döndürür."""
+    video_id = job.get('video_id')
+    error = None
+    if not video_id:
+        upload_path, upload_filename, upload_mimetype = prepare_upload(job)
+        started = time.perf_counter()
+        video_id, error = upload_file_to_azure(upload_path, upload_filename, upload_mimetype)
+        if video_id:
+            preprocess = job.get('preprocess') or {}
+            sent_size = _spooled_size(upload_path)
+            job['upload_stats'] = {
+                'original_size': preprocess.get('original_size', sent_size),
+                'sent_size': sent_size,
+                'transcoded': bool(preprocess.get('transcoded')),
+                'preprocess_seconds': preprocess.get('preprocess_seconds', 0.0),
+                'upload_seconds': round(time.perf_counter() - started, 3),
+            }
+            # Azure yüklemesi bitti; veritabanı adımı başarısız olursa tekrar yüklememek için önce ID'yi kaydet
+            jobs_collection.update_one({'_id': job['_id']}, {'$set': {
+                'video_id': video_id, 'upload_stats': job['upload_stats']}})
+    if video_id:
+        try:
+            stored_video_id = insert_video_document(job, video_id)
+            if stored_video_id != video_id:
+                # İstemci mevcut videoya yönlenir; Azure'a yüklenen kopyanın ID'si iş kaydında kalır
+                jobs_collection.update_one({'_id': job['_id']}, {'$set': {
+                    'video_id': stored_video_id, 'duplicate_upload_video_id': video_id}})
+                video_id = stored_video_id
+        except Exception as e:
+            print(f"MongoDB kayıt hatası: {e}")
+            record_error('mongo')
+            error = f"Veritabanına kayıt sırasında hata oluştu: {e}"
+    return error, video_id
+
+def upload_worker_loop():
+    while True:
+        job = None
+        jobs_collection = get_db_collection('upload_jobs')
+        if jobs_collection is not None:
+            try:
+                job = _claim_next_job(jobs_collection)
+                if job is not None:
+                    process_upload_job(jobs_collection, job)
+            except Exception as e:
+                print(f"Yükleme işçisi hatası: {e}")
+        if job is None:
+            # Yeni iş gelene veya bekleme süresi dolana kadar uyu
+            _upload_job_event.wait(UPLOAD_JOB_POLL_SECONDS)
+            _upload_job_event.clear()
+
+def preprocess_worker_loop():
+    """Ön işleme aşamasındaki işleri alır; PREPROCESS_WORKERS kadar döngü havuzu dolu tutar."""
+    while True:
+        job = None
+        jobs_collection = get_db_collection('upload_jobs')
+        if jobs_collection is not None:
+            try:
+                job = _claim_next_job(jobs_collection, JOB_STAGE_PREPROCESS)
+                if job is not None:
+                    process_preprocess_job(jobs_collection, job)
+            except Exception as e:
+                print(f"Ön işleme işçisi hatası: {e}")
+        if job is None:
+            _preprocess_job_event.wait(UPLOAD_JOB_POLL_SECONDS)
+            _preprocess_job_event.clear()
+
+# 0 ise yükleme işçileri, sorgulayıcı ve süpürücü hiç başlatılmaz (testler işleri kendisi çalıştırır)
+BACKGROUND_WORKERS_ENABLED = os.getenv('BACKGROUND_WORKERS_ENABLED', '1') == '1'
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def start_background_workers():
+    """Arka plan işçilerini süreç başına bir kez başlatır."""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    for i in range(UPLOAD_WORKER_COUNT):
+        threading.Thread(target=upload_worker_loop, name=f'upload-worker-{i}', daemon=True).start()
+    print(f"{UPLOAD_WORKER_COUNT} yükleme işçisi başlatıldı.")
+    if PREPROCESS_ENABLED:
+        for i in range(max(PREPROCESS_WORKERS, 1)):
+            threading.Thread(target=preprocess_worker_loop, name=f'preprocess-worker-{i}', daemon=True).start()
+        print(f"{max(PREPROCESS_WORKERS, 1)} ön işleme işçisi başlatıldı.")
+    if INDEX_POLL_ENABLED:
+        threading.Thread(target=index_poller_loop, name='index-poller', daemon=True).start()
+        print("İndeksleme durumu sorgulayıcısı başlatıldı.")
+    threading.Thread(target=session_sweeper_loop, name='session-sweeper', daemon=True).start()
+    if SSE_USE_CHANGE_STREAM:
+        threading.Thread(target=video_change_stream_loop, name='video-change-stream', daemon=True).start()
+    start_sse_server()
+
+def _should_start_background_workers():
+    if not BACKGROUND_WORKERS_ENABLED or multiprocessing.parent_process() is not None:
+        # Ön işleme havuzunun alt süreçleri de bu modülü import eder
+        return False
+    # app.run(debug=True): yeniden yükleyicinin izleyen üst süreci istek almaz, işçiler alt süreçte başlar
+    return __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+
+@app.before_request
+def _ensure_background_workers():
+    # Normalde işçiler modül yüklenirken başlar; bu sadece başlatılamadıkları durumlar için yedek
+    if not _background_started and _should_start_background_workers():
+        start_background_workers()
+
+def spool_stream(stream, spool_file, hasher=None):
+    """Akışı blok blok dosyaya yazar; hasher verilirse aynı bloklarla günceller (ek okuma yok)."""
+    written = 0
+    while True:
+        block = stream.read(UPLOAD_STREAM_BLOCK_SIZE)
+        if not block:
+            return written
+        spool_file.write(block)
+        if hasher is not None:
+            hasher.update(block)
+        written += len(block)
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_STREAM_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def _duplicate_video_response(video):
+    return jsonify({'message': 'Bu video daha önce yüklenmiş, mevcut analiz kullanılacak', 'duplicate': True,
+                    'video_id': video['video_id'], 'status': video.get('status'),
+                    'result_url': url_for('get_result', video_id=video['video_id'])}), 200
+
+def _queued_job_response(job, spool_path):
+    job_id = str(job['_id'])
+    if job['spool_path'] == spool_path:
+        message = 'Video alındı, Azure\'a yüklenmek üzere kuyruğa eklendi'
+    else:
+        message = 'Aynı video şu anda yükleniyor, mevcut işe bağlandı'
+    return jsonify({'message': message, 'job_id': job_id,
+                    'status_url': url_for('get_job_status', job_id=job_id)}), 202
+
+@app.route('/upload', methods=['POST'])
+def upload_video_route():
+    if 'video' not in request.files:
+        return jsonify({'error': 'Video dosyası gerekli'}), 400
+    video_file = request.files['video']
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(UPLOAD_SPOOL_DIR, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    try:
+        with timed_stage('spool_write'), open(spool_path, 'wb') as spool_file:
+            spool_stream(video_file.stream, spool_file, hasher)
+    except OSError as e:
+        print(f"Yükleme dosyası diske yazılamadı: {e}")
+        record_error('spool_io')
+        _remove_spool_file(spool_path)
+        return jsonify({'error': 'Yükleme dosyası diske yazılamadı', 'details': str(e)}), 500
+    content_hash = hasher.hexdigest()
+
+    try:
+        existing = find_video_by_hash(content_hash)
+        if existing is not None:
+            _remove_spool_file(spool_path)
+            return _duplicate_video_response(existing)
+        job = enqueue_upload_job(spool_path, video_file.filename, video_file.mimetype, content_hash=content_hash)
+    except Exception as e:
+        print(f"MongoDB iş kayıt hatası: {e}")
+        job = None
+    if job is None:
+        _remove_spool_file(spool_path)
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    return _queued_job_response(job, spool_path)
+
+# Parçalı yüklemelerde SHA-256 parçalar gelirken hesaplanır. hashlib nesneleri kaydedilemediği için
+# durum süreç belleğinde tutulur; süreç yeniden başlarsa veya parçalar başka bir süreçe giderse
+# finalize sırasında dosyadan yeniden hesaplanır.
+UPLOAD_HASHER_CACHE_SIZE = int(os.getenv('UPLOAD_HASHER_CACHE_SIZE', '256'))
+_upload_hashers = collections.OrderedDict()
+_upload_hashers_lock = threading.Lock()
+
+def _take_upload_hasher(upload_id, offset):
+    """Bu ofsete kadar hesaplanmış hasher'ı önbellekten alır; ofset uymazsa None döner."""
+    with _upload_hashers_lock:
+        entry = _upload_hashers.pop(upload_id, None)
+    if entry is None:
+        return hashlib.sha256() if offset == 0 else None
+    hashed_offset, hasher = entry
+    return hasher if hashed_offset == offset else None
+
+def _store_upload_hasher(upload_id, offset, hasher):
+    with _upload_hashers_lock:
+        _upload_hashers[upload_id] = (offset, hasher)
+        while len(_upload_hashers) > UPLOAD_HASHER_CACHE_SIZE:
+            _upload_hashers.popitem(last=False)
+
+def _get_chunked_upload(upload_id):
+    """(chunked_uploads collection'ı, yükleme dokümanı, hata_yanıtı) döndürür."""
+    uploads_collection = get_db_collection('chunked_uploads')
+    if uploads_collection is None:
+        return None, None, (jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500)
+    try:
+        upload = uploads_collection.find_one({'_id': ObjectId(upload_id)})
+    except InvalidId:
+        upload = None
+    if upload is None:
+        return uploads_collection, None, (jsonify({'error': 'Yükleme oturumu bulunamadı'}), 404)
+    return uploads_collection, upload, None
+
+def _spooled_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _chunked_upload_payload(upload, offset):
+    upload_id = str(upload['_id'])
+    return {
+        'upload_id': upload_id,
+        'offset': offset,
+        'size': upload['size'],
+        'status': upload['status'],
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'chunk_url': url_for('append_upload_chunk', upload_id=upload_id),
+        'status_url': url_for('get_chunked_upload_status', upload_id=upload_id),
+        'finalize_url': url_for('finalize_chunked_upload', upload_id=upload_id),
+    }
+
+@app.route('/upload/init', methods=['POST'])
+def init_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    size = data.get('size')
+    if not filename or not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'filename ve size (bayt) alanları gerekli'}), 400
+
+    uploads_collection = get_db_collection('chunked_uploads')
+    if uploads_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    upload = {
+        'filename': filename,
+        'size': size,
+        'mimetype': data.get('mimetype') or 'application/octet-stream',
+        'spool_path': os.path.join(UPLOAD_SPOOL_DIR, uuid.uuid4().hex),
+        'status': 'open',
+        'created_at': datetime.datetime.utcnow(),
+        'updated_at': datetime.datetime.utcnow(),
+        'locked_until': None,
+        'job_id': None,
+    }
+    try:
+        uploads_collection.insert_one(upload)
+        open(upload['spool_path'], 'wb').close()
+    except Exception as e:
+        print(f"Parçalı yükleme oturumu oluşturulamadı: {e}")
+        return jsonify({'error': 'Yükleme oturumu oluşturulamadı', 'details': str(e)}), 500
+    return jsonify(_chunked_upload_payload(upload, 0)), 201
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def get_chunked_upload_status(upload_id):
+    _, upload, error_response = _get_chunked_upload(upload_id)
+    if error_response is not None:
+        return error_response
+    return jsonify(_chunked_upload_payload(upload, _spooled_size(upload['spool_path'])))
+
+def _claim_chunked_upload(uploads_collection, upload):
+    """Açık oturumu kısa bir kira ile kilitler; kilit alınamazsa None döner."""
+    now = datetime.datetime.utcnow()
+    return uploads_collection.find_one_and_update(
+        {'_id': upload['_id'], 'status': 'open',
+         '$or': [{'locked_until': None}, {'locked_until': {'$lt': now}}]},
+        {'$set': {'locked_until': now + datetime.timedelta(seconds=UPLOAD_CHUNK_LEASE_SECONDS)}},
+        return_document=ReturnDocument.AFTER)
+
+@app.route('/upload/<upload_id>/chunk', methods=['PUT'])
+def append_upload_chunk(upload_id):
+    uploads_collection, upload, error_response = _get_chunked_upload(upload_id)
+    if error_response is not None:
+        return error_response
+    if upload['status'] != 'open':
+        return jsonify({'error': 'Yükleme oturumu kapalı', 'status': upload['status']}), 409
+
+    offset = request.args.get('offset', type=int)
+    chunk_length = request.content_length
+    if chunk_length is None:
+        return jsonify({'error': 'Content-Length başlığı gerekli'}), 411
+    if chunk_length > UPLOAD_MAX_CHUNK_BYTES:
+        return jsonify({'error': 'Parça çok büyük', 'max_chunk_bytes': UPLOAD_MAX_CHUNK_BYTES}), 413
+
+    # Ofset kontrolü ve yazma tek bir kilit altında yapılır; aynı ofsete eşzamanlı iki PUT dosyayı büyütemez
+    if _claim_chunked_upload(uploads_collection, upload) is None:
+        return jsonify({'error': 'Oturum başka bir istek tarafından yazılıyor veya kapalı',
+                        'offset': _spooled_size(upload['spool_path'])}), 409
+    try:
+        # Diskteki dosyanın boyutu, sunucunun kabul ettiği ofsettir; istemci kopan bir parçadan sonra buradan devam eder.
+        current_offset = _spooled_size(upload['spool_path'])
+        if offset != current_offset:
+            return jsonify({'error': 'Ofset uyuşmuyor', 'offset': current_offset}), 409
+        if offset + chunk_length > upload['size']:
+            return jsonify({'error': 'Parça bildirilen dosya boyutunu aşıyor', 'offset': current_offset}), 400
+
+        hasher = _take_upload_hasher(upload_id, offset)
+        disconnected = False
+        try:
+            with timed_stage('spool_write'), open(upload['spool_path'], 'r+b') as spool_file:
+                spool_file.seek(offset)
+                try:
+                    spool_stream(request.stream, spool_file, hasher)
+                except ClientDisconnected:
+                    # Bağlantı parçanın ortasında koptu; gelen bloklar kalır, istemci yeni ofsetten devam eder
+                    disconnected = True
+                written = spool_file.tell() - offset
+                # Gövde Content-Length'ten uzun gelse bile dosya bildirilen boyutu aşmasın
+                spool_file.truncate(min(offset + written, upload['size']))
+            # Kısa gelen parçada da dosya offset + written'a kesildi ve hasher tam bu baytları gördü;
+            # sonraki parçalar aynı hasher ile sürer, finalize dosyayı yeniden okumaz
+            if hasher is not None and offset + written <= upload['size']:
+                _store_upload_hasher(upload_id, offset + written, hasher)
+        except OSError as e:
+            print(f"Yükleme parçası diske yazılamadı: {e}")
+            record_error('spool_io')
+            return jsonify({'error': 'Yükleme parçası diske yazılamadı', 'details': str(e),
+                            'offset': _spooled_size(upload['spool_path'])}), 500
+
+        if disconnected:
+            return jsonify({'error': 'Parça eksik geldi, bağlantı koptu',
+                            'offset': _spooled_size(upload['spool_path']), 'size': upload['size']}), 400
+        return jsonify({'offset': _spooled_size(upload['spool_path']), 'size': upload['size']})
+    finally:
+        uploads_collection.update_one({'_id': upload['_id']}, {'$set': {
+            'locked_until': None, 'updated_at': datetime.datetime.utcnow()}})
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    uploads_collection, upload, error_response = _get_chunked_upload(upload_id)
+    if error_response is not None:
+        return error_response
+    if upload['status'] == 'finalized':
+        if upload.get('job_id') is None:
+            return _duplicate_video_response({'video_id': upload['video_id']})
+        job_id = str(upload['job_id'])
+        return jsonify({'message': 'Video zaten kuyrukta', 'job_id': job_id,
+                        'status_url': url_for('get_job_status', job_id=job_id)}), 202
+
+    received = _spooled_size(upload['spool_path'])
+    if received != upload['size']:
+        return jsonify({'error': 'Dosyanın tamamı alınmadı', 'offset': received, 'size': upload['size']}), 409
+
+    # Oturumu atomik olarak kapat ki aynı anda gelen iki finalize isteği iki iş oluşturmasın
+    claimed = uploads_collection.find_one_and_update(
+        {'_id': upload['_id'], 'status': 'open',
+         '$or': [{'locked_until': None}, {'locked_until': {'$lt': datetime.datetime.utcnow()}}]},
+        {'$set': {'status': 'finalizing'}})
+    if claimed is None:
+        return jsonify({'error': 'Yükleme oturumu zaten kapatılıyor'}), 409
+
+    hasher = _take_upload_hasher(upload_id, received)
+    try:
+        content_hash = hasher.hexdigest() if hasher is not None else file_sha256(upload['spool_path'])
+        existing = find_video_by_hash(content_hash)
+        if existing is not None:
+            _remove_spool_file(upload['spool_path'])
+            uploads_collection.update_one({'_id': upload['_id']}, {'$set': {
+                'status': 'finalized', 'content_hash': content_hash, 'video_id': existing['video_id']}})
+            return _duplicate_video_response(existing)
+        job = enqueue_upload_job(upload['spool_path'], upload['filename'], upload['mimetype'],
+                                 content_hash=content_hash)
+    except Exception as e:
+        print(f"MongoDB iş kayıt hatası: {e}")
+        job = None
+    if job is None:
+        uploads_collection.update_one({'_id': upload['_id']}, {'$set': {'status': 'open'}})
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+
+    uploads_collection.update_one({'_id': upload['_id']}, {'$set': {
+        'status': 'finalized', 'job_id': job['_id'], 'content_hash': content_hash}})
+    return _queued_job_response(job, upload['spool_path'])
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    jobs_collection = get_db_collection('upload_jobs')
+    if jobs_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    try:
+        job = jobs_collection.find_one({'_id': ObjectId(job_id)}, {'spool_path': 0, 'locked_until': 0})
+    except InvalidId:
+        job = None
+    if job is None:
+        return jsonify({'error': 'İş bulunamadı'}), 404
+    job['_id'] = str(job['_id'])
+    for key in ('created_at', 'next_attempt_at', 'started_at', 'finished_at'):
+        if isinstance(job.get(key), datetime.datetime):
+            job[key] = job[key].strftime("%Y-%m-%d %H:%M:%S UTC")
+    return jsonify(job)
+
+# Canlı yayın: tarayıcı MediaRecorder parçalarını gönderir, sunucu bunları sabit süreli
+# segmentlere böler ve her segmenti normal yükleme kuyruğuna ekler.
+LIVE_SEGMENT_SECONDS = float(os.getenv('LIVE_SEGMENT_SECONDS', '30'))
+# Bu kadar süredir parça gelmeyen canlı oturumlar kapatılır (tarayıcı kapandıysa vb.)
+LIVE_SESSION_IDLE_SECONDS = float(os.getenv('LIVE_SESSION_IDLE_SECONDS', '120'))
+LIVE_CHUNK_LEASE_SECONDS = 30
+# WebM başlığı (EBML + Segment + Tracks) normalde birkaç KB'dır; bu sınır aşılırsa akış WebM değildir
+LIVE_MAX_HEADER_BYTES = 1024 * 1024
+LIVE_MIMETYPES = ('video/webm', 'video/x-matroska')
+
+LIVE_STATUS_LIVE = 'live'
+LIVE_STATUS_STOPPED = 'stopped'
+LIVE_STATUS_FAILED = 'failed'
+
+# Matroska/WebM Cluster elemanının ID'si; her segment bir Cluster sınırından başlar
+WEBM_CLUSTER_ID = b'\x1f\x43\xb6\x75'
+# Bir sonraki parçaya taşınan, henüz diske yazılmamış kuyruk (ID parça sınırına denk gelirse kaçmasın)
+_WEBM_CARRY_BYTES = len(WEBM_CLUSTER_ID) - 1
+
+def _live_segment_path(session_id, segment_index):
+    # Yol oturum ve segment numarasından türetilir; aynı parça tekrar gönderilirse aynı dosyanın üzerine yazılır
+    return os.path.join(UPLOAD_SPOOL_DIR, f"live-{session_id}-{segment_index:05d}.webm")
+
+def _enqueue_live_segment(session, segment_end_ms):
+    """Oturumun mevcut segmentini yükleme kuyruğuna ekler."""
+    index = session['segment_index']
+    return enqueue_upload_job(
+        session['segment_path'], f"{session['name']}-{index:05d}.webm", session['mimetype'],
+        session_id=session['_id'], segment_index=index,
+        segment_start_ms=session['segment_started_ms'], segment_end_ms=segment_end_ms,
+    )
+
+class LiveSegmentWriter:
+    """Gelen WebM baytlarını diskteki segment dosyasına yazar, gerektiğinde Cluster sınırında keser.
+
+    Durum (başlık, segment numarası/yolu/boyutu, taşınan kuyruk) oturum dokümanında tutulur;
+    bellekte yalnızca okunan blok ve en fazla LIVE_MAX_HEADER_BYTES'lık başlık bulunur, bu yüzden
+    bellek kullanımı oturumun süresinden bağımsızdır.
+    """
+
+    def __init__(self, session, chunk_ms):
+        self.session = session
+        self.chunk_ms = chunk_ms
+        # t parçanın teslim edildiği (verisinin bittiği) an; parçanın verisi bir önceki parçanın t'sinden
+        # başlar. Parça içindeki Cluster sınırı bu başlangıç anına yuvarlanır.
+        self.boundary_ms = session.get('last_chunk_ms') or 0
+        self.header = bytes(session['header']) if session.get('header') is not None else None
+        started_ms = session.get('segment_started_ms')
+        # Süre dolduysa bu parçadaki ilk Cluster'dan yeni segment başlar (parça başına en fazla bir kesim)
+        self.cut_pending = (self.header is not None and started_ms is not None
+                            and self.boundary_ms - started_ms >= LIVE_SEGMENT_SECONDS * 1000)
+        self.carry = bytes(session.get('carry') or b'')
+        self.finished = []
+        self._file = open(session['segment_path'], 'r+b' if os.path.exists(session['segment_path']) else 'w+b')
+        # Yarıda kalmış bir önceki denemenin yazdıklarını at
+        self._file.truncate(session['segment_size'])
+        self._file.seek(session['segment_size'])
+
+    def _boundary(self):
+        if self.header is None:
+            self._file.flush()
+            if self._file.tell() > LIVE_MAX_HEADER_BYTES:
+                raise ValueError('WebM başlığı bulunamadı')
+            self._file.seek(0)
+            self.header = self._file.read()
+            self.session['segment_started_ms'] = self.boundary_ms
+            return
+        self._file.close()
+        self.finished.append(dict(self.session))
+        self.session['segment_index'] += 1
+        self.session['segment_path'] = _live_segment_path(self.session['_id'], self.session['segment_index'])
+        self.session['segment_started_ms'] = self.boundary_ms
+        self._file = open(self.session['segment_path'], 'w+b')
+        self._file.write(self.header)
+        self.cut_pending = False
+
+    def feed(self, block):
+        buffer = self.carry + block
+        if self.header is None or self.cut_pending:
+            position = buffer.find(WEBM_CLUSTER_ID)
+            if position >= 0:
+                self._file.write(buffer[:position])
+                self._boundary()
+                buffer = buffer[position:]
+        split = max(len(buffer) - _WEBM_CARRY_BYTES, 0)
+        self._file.write(buffer[:split])
+        self.carry = buffer[split:]
+        if self.header is None and self._file.tell() > LIVE_MAX_HEADER_BYTES:
+            raise ValueError('WebM başlığı bulunamadı')
+
+    def flush_carry(self):
+        self._file.write(self.carry)
+        self.carry = b''
+
+    def close(self):
+        self._file.close()
+        self.session['header'] = Binary(self.header) if self.header is not None else None
+        self.session['carry'] = Binary(self.carry)
+        self.session['segment_size'] = _spooled_size(self.session['segment_path'])
+
+def _live_session_payload(session):
+    session_id = str(session['_id'])
+    return {
+        'session_id': session_id,
+        'status': session['status'],
+        'next_seq': session['next_seq'],
+        'segment_seconds': LIVE_SEGMENT_SECONDS,
+        'segments_enqueued': session['segments_enqueued'],
+        'chunk_url': url_for('append_live_chunk', session_id=session_id),
+        'stop_url': url_for('stop_live_session', session_id=session_id),
+        'status_url': url_for('get_live_session', session_id=session_id),
+    }
+
+def _claim_live_session(sessions_collection, session_id, seq=None):
+    """Oturumu kısa bir kira ile kilitler; aynı oturumun parçaları sırayla işlenir.
+
+    (oturum, hata_yanıtı) döndürür.
+    """
+    try:
+        object_id = ObjectId(session_id)
+    except InvalidId:
+        return None, (jsonify({'error': 'Canlı oturum bulunamadı'}), 404)
+    now = datetime.datetime.utcnow()
+    query = {'_id': object_id, 'status': LIVE_STATUS_LIVE,
+             '$or': [{'locked_until': None}, {'locked_until': {'$lt': now}}]}
+    if seq is not None:
+        query['next_seq'] = seq
+    session = sessions_collection.find_one_and_update(
+        query, {'$set': {'locked_until': now + datetime.timedelta(seconds=LIVE_CHUNK_LEASE_SECONDS)}},
+        return_document=ReturnDocument.AFTER)
+    if session is not None:
+        return session, None
+    session = sessions_collection.find_one({'_id': object_id}, {'status': 1, 'next_seq': 1})
+    if session is None:
+        return None, (jsonify({'error': 'Canlı oturum bulunamadı'}), 404)
+    if session['status'] != LIVE_STATUS_LIVE:
+        return None, (jsonify({'error': 'Canlı oturum kapalı', 'status': session['status']}), 409)
+    if seq is not None and session['next_seq'] != seq:
+        return None, (jsonify({'error': 'Parça sırası uyuşmuyor', 'next_seq': session['next_seq']}), 409)
+    return None, (jsonify({'error': 'Oturum başka bir istek tarafından işleniyor', 'next_seq': session['next_seq']}), 409)
+
+def _save_live_session(sessions_collection, session, **changes):
+    fields = ('header', 'carry', 'segment_index', 'segment_path', 'segment_size', 'segment_started_ms',
+              'segments_enqueued', 'next_seq', 'status')
+    update = {key: session[key] for key in fields}
+    update.update(changes)
+    update['locked_until'] = None
+    update['updated_at'] = datetime.datetime.utcnow()
+    sessions_collection.update_one({'_id': session['_id']}, {'$set': update})
+
+def close_live_session(sessions_collection, session, status=LIVE_STATUS_STOPPED, end_ms=None):
+    """Taşınan baytları yazar, son segmenti (içinde Cluster varsa) kuyruğa ekler ve oturumu kapatır.
+
+    end_ms istemcinin bildirdiği kayıt bitiş anıdır; yoksa (ör. boşta kalan oturum) son parçanın
+    teslim anı kullanılır.
+    """
+    header = session.get('header')
+    last_chunk_ms = session.get('last_chunk_ms') or 0
+    writer = LiveSegmentWriter(session, last_chunk_ms)
+    writer.flush_carry()
+    writer.close()
+    if header is not None and session['segment_size'] > len(header):
+        _enqueue_live_segment(session, max(end_ms or 0, last_chunk_ms))
+        session['segments_enqueued'] += 1
+    else:
+        _remove_spool_file(session['segment_path'])
+    session['status'] = status
+    _save_live_session(sessions_collection, session, stopped_at=datetime.datetime.utcnow())
+
+def close_idle_live_sessions():
+    """LIVE_SESSION_IDLE_SECONDS boyunca parça gelmeyen oturumları kapatır."""
+    sessions_collection = get_db_collection('live_sessions')
+    if sessions_collection is None:
+        return
+    deadline = datetime.datetime.utcnow() - datetime.timedelta(seconds=LIVE_SESSION_IDLE_SECONDS)
+    for session in sessions_collection.find({'status': LIVE_STATUS_LIVE, 'updated_at': {'$lt': deadline}}, {'_id': 1}):
+        claimed, _ = _claim_live_session(sessions_collection, str(session['_id']))
+        if claimed is not None:
+            close_live_session(sessions_collection, claimed)
+            print(f"Boşta kalan canlı oturum {claimed['_id']} kapatıldı ({claimed['segments_enqueued']} segment).")
+
+def remove_stale_chunked_uploads():
+    """UPLOAD_SESSION_TTL_SECONDS boyunca parça gelmeyen açık parçalı yüklemeleri ve dosyalarını siler."""
+    uploads_collection = get_db_collection('chunked_uploads')
+    if uploads_collection is None:
+        return
+    now = datetime.datetime.utcnow()
+    deadline = now - datetime.timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+    # updated_at alanı olmayan eski oturumlar için created_at kullanılır
+    stale = {'status': 'open', '$or': [
+        {'updated_at': {'$lt': deadline}},
+        {'updated_at': {'$exists': False}, 'created_at': {'$lt': deadline}},
+    ]}
+    for upload in uploads_collection.find(stale, {'_id': 1}):
+        # O sırada parça yazan bir istek varsa (kira geçerli) oturuma dokunma
+        removed = uploads_collection.find_one_and_delete({'$and': [
+            dict(stale, _id=upload['_id']),
+            {'$or': [{'locked_until': None}, {'locked_until': {'$lt': now}}]},
+        ]})
+        if removed is not None:
+            _remove_spool_file(removed['spool_path'])
+            with _upload_hashers_lock:
+                _upload_hashers.pop(str(removed['_id']), None)
+            print(f"Terk edilmiş parçalı yükleme {removed['_id']} silindi.")
+
+def session_sweeper_loop():
+    while True:
+        time.sleep(max(LIVE_SESSION_IDLE_SECONDS / 2, 5))
+        try:
+            close_idle_live_sessions()
+        except Exception as e:
+            print(f"Canlı oturum temizleme hatası: {e}")
+        try:
+            remove_stale_chunked_uploads()
+        except Exception as e:
+            print(f"Parçalı yükleme temizleme hatası: {e}")
+
+@app.route('/live/start', methods=['POST'])
+def start_live_session():
+    data = request.get_json(silent=True) or {}
+    mimetype = data.get('mimetype') or 'video/webm'
+    if not mimetype.startswith(LIVE_MIMETYPES):
+        return jsonify({'error': 'Canlı yayın için yalnızca WebM desteklenir', 'mimetype': mimetype}), 415
+
+    sessions_collection = get_db_collection('live_sessions')
+    if sessions_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    now = datetime.datetime.utcnow()
+    session_id = ObjectId()
+    session = {
+        '_id': session_id,
+        'name': data.get('name') or f"canli-{now.strftime('%Y%m%d-%H%M%S')}",
+        'mimetype': mimetype.split(';', 1)[0],
+        'status': LIVE_STATUS_LIVE,
+        'created_at': now,
+        'updated_at': now,
+        'next_seq': 0,
+        'locked_until': None,
+        'header': None,
+        'carry': Binary(b''),
+        'segment_index': 0,
+        'segment_path': _live_segment_path(session_id, 0),
+        'segment_size': 0,
+        'segment_started_ms': None,
+        'segments_enqueued': 0,
+    }
+    try:
+        sessions_collection.insert_one(session)
+    except Exception as e:
+        print(f"Canlı oturum oluşturulamadı: {e}")
+        return jsonify({'error': 'Canlı oturum oluşturulamadı', 'details': str(e)}), 500
+    return jsonify(_live_session_payload(session)), 201
+
+@app.route('/live/<session_id>/chunk', methods=['POST'])
+def append_live_chunk(session_id):
+    seq = request.args.get('seq', type=int)
+    if seq is None:
+        return jsonify({'error': 'seq parametresi gerekli'}), 400
+    chunk_length = request.content_length
+    if chunk_length is None:
+        return jsonify({'error': 'Content-Length başlığı gerekli'}), 411
+    if chunk_length > UPLOAD_MAX_CHUNK_BYTES:
+        return jsonify({'error': 'Parça çok büyük', 'max_chunk_bytes': UPLOAD_MAX_CHUNK_BYTES}), 413
+
+    sessions_collection = get_db_collection('live_sessions')
+    if sessions_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    session, error_response = _claim_live_session(sessions_collection, session_id, seq)
+    if error_response is not None:
+        return error_response
+
+    # t: istemcinin kayıt başlangıcından itibaren ms cinsinden zamanı; yoksa sunucu saati kullanılır
+    chunk_ms = request.args.get('t', type=int)
+    if chunk_ms is None:
+        chunk_ms = int((datetime.datetime.utcnow() - session['created_at']).total_seconds() * 1000)
+
+    try:
+        writer = LiveSegmentWriter(session, chunk_ms)
+        try:
+            while True:
+                block = request.stream.read(UPLOAD_STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                writer.feed(block)
+        finally:
+            writer.close()
+    except ValueError as e:
+        session['status'] = LIVE_STATUS_FAILED
+        _save_live_session(sessions_collection, session, last_error=str(e))
+        _remove_spool_file(session['segment_path'])
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        print(f"Canlı yayın parçası diske yazılamadı: {e}")
+        sessions_collection.update_one({'_id': session['_id']}, {'$set': {'locked_until': None}})
+        return jsonify({'error': 'Canlı yayın parçası diske yazılamadı', 'details': str(e),
+                        'next_seq': seq}), 500
+
+    try:
+        # Biten segmentler hemen kuyruğa girer; yayın sürerken analizleri başlar
+        for finished in writer.finished:
+            _enqueue_live_segment(finished, writer.boundary_ms)
+            session['segments_enqueued'] += 1
+    except Exception as e:
+        print(f"MongoDB iş kayıt hatası: {e}")
+        sessions_collection.update_one({'_id': session['_id']}, {'$set': {'locked_until': None}})
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı', 'next_seq': seq}), 500
+
+    session['next_seq'] = seq + 1
+    _save_live_session(sessions_collection, session, last_chunk_ms=chunk_ms)
+    return jsonify({'next_seq': session['next_seq'], 'segment_index': session['segment_index'],
+                    'segments_enqueued': session['segments_enqueued']})
+
+@app.route('/live/<session_id>/stop', methods=['POST'])
+def stop_live_session(session_id):
+    sessions_collection = get_db_collection('live_sessions')
+    if sessions_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    session, error_response = _claim_live_session(sessions_collection, session_id)
+    if error_response is not None:
+        return error_response
+    try:
+        # t: kaydın durdurulduğu an (kayıt başlangıcından itibaren ms)
+        close_live_session(sessions_collection, session, end_ms=request.args.get('t', type=int))
+    except Exception as e:
+        print(f"Canlı oturum kapatılamadı: {e}")
+        sessions_collection.update_one({'_id': session['_id']}, {'$set': {'locked_until': None}})
+        return jsonify({'error': 'Canlı oturum kapatılamadı', 'details': str(e)}), 500
+    return jsonify(_live_session_payload(session))
+
+@app.route('/live/<session_id>', methods=['GET'])
+def get_live_session(session_id):
+    sessions_collection = get_db_collection('live_sessions')
+    jobs_collection = get_db_collection('upload_jobs')
+    videos_collection = get_db_collection('videos')
+    if sessions_collection is None or jobs_collection is None or videos_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    try:
+        session = sessions_collection.find_one({'_id': ObjectId(session_id)}, {'header': 0, 'carry': 0})
+    except InvalidId:
+        session = None
+    if session is None:
+        return jsonify({'error': 'Canlı oturum bulunamadı'}), 404
+
+    # Segment başına yükleme işi ve (Azure'a ulaştıysa) video kaydı birleştirilir
+    segments = {}
+    for job in jobs_collection.find({'session_id': session['_id']},
+                                    {'segment_index': 1, 'segment_start_ms': 1, 'segment_end_ms': 1,
+                                     'status': 1, 'video_id': 1, 'last_error': 1}):
+        segments[job['segment_index']] = {
+            'segment_index': job['segment_index'],
+            'start_seconds': (job.get('segment_start_ms') or 0) / 1000.0,
+            'end_seconds': (job['segment_end_ms'] / 1000.0) if job.get('segment_end_ms') is not None else None,
+            'job_status': job['status'],
+            'last_error': job.get('last_error'),
+            'video_id': job.get('video_id'),
+            'status': None,
+        }
+    for video in videos_collection.find({'session_id': session['_id']},
+                                        {'segment_index': 1, 'video_id': 1, 'status': 1, 'processing_progress': 1}):
+        segment = segments.setdefault(video['segment_index'], {'segment_index': video['segment_index']})
+        segment.update({'video_id': video['video_id'], 'status': video.get('status'),
+                        'processing_progress': video.get('processing_progress'),
+                        'result_url': url_for('get_result', video_id=video['video_id'])})
+
+    payload = _live_session_payload(session)
+    payload['segments'] = [segments[index] for index in sorted(segments)]
+    return jsonify(payload)
+
+# Video listesi sayfalama ayarları
+VIDEO_PAGE_SIZE = int(os.getenv('VIDEO_PAGE_SIZE', '50'))
+VIDEO_PAGE_MAX_SIZE = int(os.getenv('VIDEO_PAGE_MAX_SIZE', '200'))
+# Tablonun gösterdiği alanlar dışında hiçbir şey çekilmez
+VIDEO_LIST_PROJECTION = {'video_id': 1, 'filename': 1, 'upload_date': 1, 'status': 1, 'processing_progress': 1}
+VIDEO_STATUS_FILTERS = ['Uploaded', 'Processing', 'Processed', 'Failed']
+
+def encode_video_cursor(video):
+    """Bir sonraki sayfanın başlangıcını (upload_date, _id) opak bir string olarak kodlar."""
+    raw = f"{video['upload_date'].isoformat()}|{video['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_video_cursor(cursor):
+    """encode_video_cursor'ın tersi. Geçersiz cursor için ValueError fırlatır."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        upload_date, object_id = raw.split('|', 1)
+        return datetime.datetime.fromisoformat(upload_date), ObjectId(object_id)
+    except (ValueError, UnicodeDecodeError, InvalidId) as e:
+        raise ValueError('Geçersiz cursor') from e
+
+def query_video_page(status=None, filename_prefix=None, cursor=None, limit=VIDEO_PAGE_SIZE):
+    """upload_date/_id'ye göre azalan sırada bir sayfa video döndürür: (videolar, sonraki_cursor).
+
+    Keyset sayfalama kullanır; sayfa maliyeti collection boyutundan bağımsızdır.
+    """
     videos_collection = get_db_collection('videos')
     if videos_collection is None:
-        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
-        
-    video_document = {
-        'video_id': video_id_from_azure,
-        'filename': filename,
-        'upload_date': upload_date,
-        'status': 'Uploaded'
-    }
+        return [], None
+
+    query = {}
+    if status:
+        query['status'] = status
+    if filename_prefix:
+        query['filename'] = {'$regex': '^' + re.escape(filename_prefix)}
+    if cursor:
+        last_date, last_id = decode_video_cursor(cursor)
+        query['$or'] = [
+            {'upload_date': {'$lt': last_date}},
+            {'upload_date': last_date, '_id': {'$lt': last_id}},
+        ]
+
+    # Bir fazlasını çekip sonraki sayfanın olup olmadığını anla
+    with timed_stage('mongo_query'):
+        videos = list(videos_collection.find(query, VIDEO_LIST_PROJECTION)
+                      .sort([('upload_date', -1), ('_id', -1)])
+                      .limit(limit + 1))
+    next_cursor = encode_video_cursor(videos[limit - 1]) if len(videos) > limit else None
+    return videos[:limit], next_cursor
+
+def _video_list_args():
+    """İstekten (status, filename_prefix, cursor, limit) okur."""
+    limit = request.args.get('limit', VIDEO_PAGE_SIZE, type=int)
+    return (
+        request.args.get('status') or None,
+        request.args.get('q') or None,
+        request.args.get('cursor') or None,
+        max(1, min(limit, VIDEO_PAGE_MAX_SIZE)),
+    )
+
+@app.route('/api/videos', methods=['GET'])
+def list_videos_api():
+    status, filename_prefix, cursor, limit = _video_list_args()
     try:
-        result = videos_collection.insert_one(video_document)
-        print(f"MongoDB'ye eklendi, _id: {result.inserted_id}, video_id: {video_id_from_azure}")
+        videos, next_cursor = query_video_page(status, filename_prefix, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"MongoDB kayıt hatası: {e}")
-        return jsonify({'error': 'Veritabanına kayıt sırasında hata oluştu', 'details': str(e)}), 500
+        print(f"Videoları MongoDB'den çekerken hata: {e}")
+        return jsonify({'error': 'Videolar veritabanından alınamadı', 'details': str(e)}), 500
 
-    return jsonify({'message': 'Video yüklendi ve veritabanına kaydedildi', 'video_id': video_id_from_azure})
-
-@app.route('/')
-def home():
-    videos_collection = get_db_collection('videos')
-    video_list = []
-    if videos_collection is not None:
-        try:
-            fetched_videos = list(videos_collection.find().sort('upload_date', -1))
-            for video in fetched_videos:
-                video['_id'] = str(video['_id'])
-                if isinstance(video.get('upload_date'), datetime.datetime):
-                     video['upload_date'] = video['upload_date'].strftime("%Y-%m-%d %H:%M:%S UTC")
-                video_list.append(video)
-        except Exception as e:
-            print(f"Videoları MongoDB'den çekerken hata: {e}")
+    for video in videos:
+        video['_id'] = str(video['_id'])
+        if isinstance(video.get('upload_date'), datetime.datetime):
+            video['upload_date'] = video['upload_date'].isoformat() + 'Z'
+    return jsonify({'videos': videos, 'next_cursor': next_cursor})
 
-    return render_template_string("""
+# Şablonlar uygulama açılırken bir kez derlenir; her istekte yeniden derlenmez.
+HOME_TEMPLATE_SOURCE = """
     <!DOCTYPE html>
     <html lang="tr">
     <head>
@@ -157,6 +2025,7 @@ def home():
             td a:hover { text-decoration: underline; }
             hr { border: 0; height: 1px; background-color: #e0e0e0; margin: 30px 0; }
             .video-container video { margin-bottom: 10px; }
+            .filters input[type=\"text\"], .filters select { padding: 8px; border: 1px solid #ccc; border-radius: 4px; margin-right: 5px; }
         </style>
     </head>
     <body>
@@ -176,21 +2045,32 @@ def home():
             <hr>
 
             <div class="section">
-                <h3>2. Canlı Kamera Akışı (WebRTC Demo)</h3>
-                <p>Bu bölüm, WebRTC kullanarak tarayıcınızdan anlık canlı kamera görüntüsünü gösterir. Bu akış kaydedilmez veya analiz edilmez, sadece gerçek zamanlı video akışı teknolojisini demonstre eder.</p>
+                <h3>2. Canlı Kamera Akışı</h3>
+                <p>Kamera görüntüsü kaydedilir ve sunucuya parça parça gönderilir. Sunucu akışı yaklaşık {{ live_segment_seconds|int }} saniyelik segmentlere böler; her segment ayrı bir video olarak analiz edilir, böylece yayın sürerken ilk sonuçlar görünmeye başlar.</p>
                 <button id="startLive">Canlı Akışı Başlat</button>
                 <button id="stopLive" style="display:none;" class="danger">Canlı Akışı Durdur</button>
                 <div id="liveSection" style="display:none; margin-top:10px;" class="video-container">
                     <video id="liveVideo" width="320" height="240" autoplay muted playsinline></video>
                 </div>
                 <div id="liveStatus"></div>
+                <ul id="liveSegments"></ul>
             </div>
 
             <hr>
 
             <div class="section">
                 <h3>3. Yüklenen Videolar (Veritabanı Kayıtları)</h3>
-                <table>
+                <form method="get" action="{{ url_for('home') }}" class="filters">
+                    <input type="text" name="q" value="{{ filename_prefix or '' }}" placeholder="Dosya adı ile başlayan...">
+                    <select name="status">
+                        <option value="">Tüm durumlar</option>
+                        {% for status_option in status_filters %}
+                        <option value="{{ status_option }}" {% if status_option == status %}selected{% endif %}>{{ status_option }}</option>
+                        {% endfor %}
+                    </select>
+                    <button type="submit">Filtrele</button>
+                </form>
+                <table id="videoTable" data-first-page="{{ '0' if (cursor or status or filename_prefix) else '1' }}">
                     <thead>
                         <tr>
                             <th>Video ID (Azure)</th>
@@ -202,19 +2082,33 @@ def home():
                     </thead>
                     <tbody>
                         {% for video_doc in videos %}
-                        <tr>
+                        <tr data-video-id="{{ video_doc.video_id }}">
                             <td>{{ video_doc.video_id }}</td>
                             <td>{{ video_doc.filename }}</td>
                             <td>{{ video_doc.upload_date }}</td>
-                            <td>{{ video_doc.status }}</td>
+                            <td class="status">{{ video_doc.status }}{% if video_doc.status == 'Processing' and video_doc.processing_progress %} ({{ video_doc.processing_progress }}){% endif %}</td>
                             <td><a href="{{ url_for('get_result', video_id=video_doc.video_id) }}" target="_blank">Analizi Gör</a></td>
                         </tr>
                         {% else %}
-                        <tr><td colspan="5">Henüz veritabanına kaydedilmiş video bulunmamaktadır.</td></tr>
+                        <tr id="emptyRow"><td colspan="5">Henüz veritabanına kaydedilmiş video bulunmamaktadır.</td></tr>
                         {% endfor %}
                     </tbody>
                 </table>
-                 <button onclick="location.reload()" style="margin-top:15px;">Listeyi Yenile</button>
+                 <p id="liveUpdates" style="color:#7f8c8d;">Canlı güncelleme bağlanıyor...</p>
+                 {% if next_cursor %}
+                 <a href="{{ url_for('home', cursor=next_cursor, status=status, q=filename_prefix) }}" style="margin-left:10px;">Sonraki Sayfa &raquo;</a>
+                 {% endif %}
+            </div>
+
+            <hr>
+
+            <div class="section">
+                <h3>4. Analizlerde Ara</h3>
+                <form id="searchForm" class="filters">
+                    <input type="text" id="searchInput" placeholder="Anahtar kelime, konu, etiket veya konuşma metni..." required>
+                    <button type="submit">Ara</button>
+                </form>
+                <ul id="searchResults"></ul>
             </div>
         </div>
 
@@ -231,42 +2125,390 @@ def home():
         const liveVideo = document.getElementById('liveVideo');
         const liveStatus = document.getElementById('liveStatus');
 
+        const liveSegments = document.getElementById('liveSegments');
+        const LIVE_TIMESLICE_MS = 2000;
+        let liveRecorder = null;
+        let liveSession = null;
+        let liveQueue = Promise.resolve();
+        let liveSeq = 0;
+        let liveStartedAt = 0;
+        let liveStatusTimer = null;
+
+        function liveMimeType() {
+            for (const type of ['video/webm;codecs=vp8,opus', 'video/webm;codecs=vp9,opus', 'video/webm']) {
+                if (window.MediaRecorder && MediaRecorder.isTypeSupported(type)) {
+                    return type;
+                }
+            }
+            return null;
+        }
+
+        // Parçalar sırayla gönderilir; sunucu beklediği sırayı (next_seq) bildirir
+        async function sendLiveChunk(blob, seq, timestamp) {
+            for (let attempt = 1; attempt <= 5; attempt++) {
+                try {
+                    const response = await fetch(`${liveSession.chunk_url}?seq=${seq}&t=${timestamp}`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/octet-stream' },
+                        body: blob
+                    });
+                    const result = await response.json();
+                    if (response.ok || (response.status === 409 && result.next_seq > seq)) {
+                        return;
+                    }
+                    if (response.status < 500 && response.status !== 409) {
+                        throw new Error(result.error || `HTTP ${response.status}`);
+                    }
+                } catch (error) {
+                    if (attempt === 5) {
+                        throw error;
+                    }
+                }
+                await sleep(500 * attempt);
+            }
+        }
+
+        async function refreshLiveSegments() {
+            if (!liveSession) {
+                return;
+            }
+            try {
+                const response = await fetch(liveSession.status_url);
+                const session = await response.json();
+                liveSegments.innerHTML = '';
+                for (const segment of session.segments || []) {
+                    const item = document.createElement('li');
+                    const range = `${formatSeconds(segment.start_seconds || 0)} - ${segment.end_seconds != null ? formatSeconds(segment.end_seconds) : '...'}`;
+                    item.textContent = `Segment ${segment.segment_index + 1} (${range}): ${segment.status ? statusText(segment) : segment.job_status} `;
+                    if (segment.result_url) {
+                        const link = document.createElement('a');
+                        link.href = segment.result_url;
+                        link.target = '_blank';
+                        link.textContent = 'Analizi Gör';
+                        item.appendChild(link);
+                    }
+                    liveSegments.appendChild(item);
+                }
+            } catch (error) {
+                // Geçici ağ hatası: bir sonraki turda tekrar dene
+            }
+        }
+
         startLiveBtn.onclick = async () => {
             liveStatus.innerHTML = '';
+            liveSegments.innerHTML = '';
+            const mimeType = liveMimeType();
+            if (!mimeType) {
+                liveStatus.innerHTML = '<p class="error">Tarayıcınız WebM kaydını desteklemiyor; canlı analiz için Chrome, Edge veya Firefox kullanın.</p>';
+                return;
+            }
             liveSection.style.display = 'block';
             try {
                 currentLiveStream = await navigator.mediaDevices.getUserMedia({ video: true, audio: true });
                 liveVideo.srcObject = currentLiveStream;
+                const response = await fetch("{{ url_for('start_live_session') }}", {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ mimetype: mimeType })
+                });
+                liveSession = await response.json();
+                if (!response.ok) {
+                    throw new Error(liveSession.error || `HTTP ${response.status}`);
+                }
+                liveSeq = 0;
+                liveStartedAt = performance.now();
+                liveQueue = Promise.resolve();
+                liveRecorder = new MediaRecorder(currentLiveStream, { mimeType });
+                liveRecorder.ondataavailable = (event) => {
+                    if (!event.data || event.data.size === 0) {
+                        return;
+                    }
+                    const seq = liveSeq++;
+                    const timestamp = Math.round(performance.now() - liveStartedAt);
+                    liveQueue = liveQueue.then(() => sendLiveChunk(event.data, seq, timestamp)).catch(error => {
+                        liveStatus.innerHTML = `<p class="error">Canlı yayın parçası gönderilemedi: ${error.message}</p>`;
+                    });
+                };
+                liveRecorder.start(LIVE_TIMESLICE_MS);
+                liveStatusTimer = setInterval(refreshLiveSegments, 5000);
                 startLiveBtn.style.display = 'none';
                 stopLiveBtn.style.display = 'inline-block';
-                liveStatus.innerHTML = '<p class="success">Canlı akış başlatıldı.</p>';
+                liveStatus.innerHTML = '<p class="success">Canlı akış başlatıldı, segmentler analiz için gönderiliyor.</p>';
             } catch (e) {
+                if (currentLiveStream) {
+                    currentLiveStream.getTracks().forEach(track => track.stop());
+                }
                 liveStatus.innerHTML = '<p class="error">Canlı yayın için kamera erişimi reddedildi veya bir hata oluştu: ' + e.message + '</p>';
                 liveSection.style.display = 'none';
             }
         };
 
-        stopLiveBtn.onclick = () => {
+        stopLiveBtn.onclick = async () => {
+            stopLiveBtn.style.display = 'none';
+            let recordingEndMs = null;
+            if (liveRecorder && liveRecorder.state !== 'inactive') {
+                recordingEndMs = Math.round(performance.now() - liveStartedAt);
+                // stop() son parçayı ondataavailable ile teslim eder
+                const stopped = new Promise(resolve => liveRecorder.addEventListener('stop', resolve, { once: true }));
+                liveRecorder.stop();
+                await stopped;
+            }
             if (currentLiveStream) {
                 currentLiveStream.getTracks().forEach(track => track.stop());
             }
             liveVideo.srcObject = null;
             liveSection.style.display = 'none';
             startLiveBtn.style.display = 'inline-block';
-            stopLiveBtn.style.display = 'none';
-            liveStatus.innerHTML = '<p class="success">Canlı akış durduruldu.</p>';
+            if (liveSession) {
+                await liveQueue;
+                const stopUrl = recordingEndMs === null ? liveSession.stop_url : `${liveSession.stop_url}?t=${recordingEndMs}`;
+                await fetch(stopUrl, { method: 'POST' }).catch(() => null);
+                await refreshLiveSegments();
+            }
+            clearInterval(liveStatusTimer);
+            liveStatus.innerHTML = '<p class="success">Canlı akış durduruldu. Kalan segmentlerin analizi tamamlandıkça tabloda görünür.</p>';
         };
 
+        // Yükleme işi bitene kadar durumunu periyodik olarak sorgula
+        async function pollJob(statusUrl) {
+            try {
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+                if (job.status === 'done' && job.video_id) {
+                    uploadStatus.innerHTML = `<p class="success">Video yüklendi ve veritabanına kaydedildi (Video ID: ${job.video_id}). <a href="/result/${job.video_id}" target="_blank">Analizi Gör</a></p>`;
+                    return;
+                }
+                if (job.status === 'failed') {
+                    uploadStatus.innerHTML = `<p class="error">Hata: Azure'a yükleme başarısız oldu. ${job.last_error || ''}</p>`;
+                    return;
+                }
+                const retryInfo = job.last_error ? ` (deneme ${job.attempts}, tekrar denenecek)` : '';
+                uploadStatus.innerHTML = `<p>Azure'a yükleniyor... Durum: ${job.status}${retryInfo}</p>`;
+            } catch (error) {
+                // Geçici ağ hatası: bir sonraki turda tekrar dene
+            }
+            setTimeout(() => pollJob(statusUrl), 2000);
+        }
+
+        // Durum değişiklikleri sunucudan SSE ile gelir; tablo yerinde güncellenir
+        const videoTableBody = document.querySelector('#videoTable tbody');
+        const liveUpdates = document.getElementById('liveUpdates');
+        const isFirstPage = document.getElementById('videoTable').dataset.firstPage === '1';
+
+        function statusText(video) {
+            return video.status === 'Processing' && video.processing_progress
+                ? `${video.status} (${video.processing_progress})` : video.status;
+        }
+
+        function applyVideoUpdate(video) {
+            let row = videoTableBody.querySelector(`tr[data-video-id="${CSS.escape(video.video_id)}"]`);
+            if (!row) {
+                // Yeni video: sadece filtresiz ilk sayfada en üste eklenir
+                if (!isFirstPage || !video.filename) {
+                    return;
+                }
+                const emptyRow = document.getElementById('emptyRow');
+                if (emptyRow) {
+                    emptyRow.remove();
+                }
+                row = document.createElement('tr');
+                row.dataset.videoId = video.video_id;
+                for (const value of [video.video_id, video.filename, video.upload_date || '']) {
+                    const cell = document.createElement('td');
+                    cell.textContent = value;
+                    row.appendChild(cell);
+                }
+                const statusCell = document.createElement('td');
+                statusCell.className = 'status';
+                row.appendChild(statusCell);
+                const actionCell = document.createElement('td');
+                const link = document.createElement('a');
+                link.href = `/result/${encodeURIComponent(video.video_id)}`;
+                link.target = '_blank';
+                link.textContent = 'Analizi Gör';
+                actionCell.appendChild(link);
+                row.appendChild(actionCell);
+                videoTableBody.prepend(row);
+            }
+            if (video.status) {
+                row.querySelector('td.status').textContent = statusText(video);
+            }
+        }
+
+        let fallbackPolling = null;
+        function startFallbackPolling() {
+            if (fallbackPolling) return;
+            liveUpdates.textContent = "Canlı bağlantı sınırı dolu; durumlar {{ sse_fallback_poll_seconds|int }} sn'de bir yenileniyor.";
+            fallbackPolling = setInterval(async () => {
+                try {
+                    const response = await fetch("{{ url_for('list_videos_api', status=status, q=filename_prefix) }}");
+                    if (!response.ok) return;
+                    const result = await response.json();
+                    // Eskiden yeniye uygulanır ki yeni satırlar doğru sırayla en üste eklensin
+                    result.videos.slice().reverse().forEach(applyVideoUpdate);
+                } catch (error) {
+                    // Geçici ağ hatası; sonraki turda tekrar denenir
+                }
+            }, {{ (sse_fallback_poll_seconds * 1000)|int }});
+        }
+
+        if (window.EventSource) {
+            const events = new EventSource("{{ sse_url }}");
+            events.addEventListener('video', event => applyVideoUpdate(JSON.parse(event.data)));
+            events.onopen = () => { liveUpdates.textContent = 'Canlı güncelleme açık: durum değişiklikleri otomatik görünür.'; };
+            events.onerror = () => {
+                // 503 gibi hatalı yanıtlarda tarayıcı yeniden bağlanmaz (CLOSED); sorgulamaya geç
+                if (events.readyState === EventSource.CLOSED) {
+                    startFallbackPolling();
+                } else {
+                    liveUpdates.textContent = 'Canlı güncelleme bağlantısı koptu, yeniden bağlanılıyor...';
+                }
+            };
+        } else {
+            startFallbackPolling();
+        }
+
+        const searchForm = document.getElementById('searchForm');
+        const searchResults = document.getElementById('searchResults');
+
+        function formatSeconds(value) {
+            const minutes = Math.floor(value / 60);
+            const seconds = Math.floor(value % 60);
+            return `${minutes}:${String(seconds).padStart(2, '0')}`;
+        }
+
+        searchForm.addEventListener('submit', async function(event) {
+            event.preventDefault();
+            const query = document.getElementById('searchInput').value;
+            searchResults.innerHTML = '<li>Aranıyor...</li>';
+            try {
+                const response = await fetch(`{{ url_for('search_route') }}?q=${encodeURIComponent(query)}`);
+                const result = await response.json();
+                searchResults.innerHTML = '';
+                if (!response.ok) {
+                    searchResults.innerHTML = `<li class="error">Hata: ${result.error}</li>`;
+                    return;
+                }
+                if (result.results.length === 0) {
+                    searchResults.innerHTML = '<li>Sonuç bulunamadı.</li>';
+                    return;
+                }
+                for (const video of result.results) {
+                    const item = document.createElement('li');
+                    const link = document.createElement('a');
+                    link.href = `/result/${encodeURIComponent(video.video_id)}`;
+                    link.target = '_blank';
+                    link.textContent = video.filename || video.video_id;
+                    item.appendChild(link);
+                    const details = video.matches.map(match => {
+                        const times = match.hits.map(hit => formatSeconds(hit.start)).join(', ');
+                        return `${match.kind}: ${match.text}${times ? ' @ ' + times : ''}`;
+                    });
+                    item.appendChild(document.createTextNode(' - ' + details.join(' | ')));
+                    searchResults.appendChild(item);
+                }
+            } catch (error) {
+                searchResults.innerHTML = `<li class="error">Arama sırasında hata oluştu: ${error}</li>`;
+            }
+        });
+
+        const CHUNK_SIZE = {{ chunk_size }};
+        const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+        // Aynı dosya tekrar seçilirse (ör. sayfa yenilendikten sonra) yarım kalan oturumdan devam et
+        function resumeKey(file) {
+            return `chunkedUpload:${file.name}:${file.size}:${file.lastModified}`;
+        }
+
+        async function openUploadSession(file) {
+            const saved = localStorage.getItem(resumeKey(file));
+            if (saved) {
+                const response = await fetch(saved);
+                if (response.ok) {
+                    const session = await response.json();
+                    if (session.status === 'open') {
+                        return session;
+                    }
+                }
+                localStorage.removeItem(resumeKey(file));
+            }
+            const response = await fetch("{{ url_for('init_chunked_upload') }}", {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size, mimetype: file.type })
+            });
+            const session = await response.json();
+            if (!response.ok) {
+                throw new Error(session.error || `HTTP ${response.status}`);
+            }
+            localStorage.setItem(resumeKey(file), session.status_url);
+            return session;
+        }
+
+        async function uploadInChunks(file) {
+            const session = await openUploadSession(file);
+            let offset = session.offset;
+            let failures = 0;
+            while (offset < file.size) {
+                uploadStatus.innerHTML = `<p>Yükleniyor... %${Math.floor(offset * 100 / file.size)}</p>`;
+                try {
+                    const chunk = file.slice(offset, offset + CHUNK_SIZE);
+                    const response = await fetch(`${session.chunk_url}?offset=${offset}`, {
+                        method: 'PUT',
+                        headers: { 'Content-Type': 'application/octet-stream' },
+                        body: chunk
+                    });
+                    const result = await response.json();
+                    if (response.ok || response.status === 409) {
+                        // 409: sunucu farklı bir ofsette, onun bildirdiği yerden devam et
+                        if (typeof result.offset !== 'number') {
+                            throw new Error(result.error || `HTTP ${response.status}`);
+                        }
+                        offset = result.offset;
+                        failures = 0;
+                        if (response.status === 409) {
+                            // Oturum başka bir istek tarafından yazılıyor olabilir; kısa bir süre bekle
+                            await sleep(500);
+                        }
+                    } else {
+                        throw new Error(result.error || `HTTP ${response.status}`);
+                    }
+                } catch (error) {
+                    failures += 1;
+                    if (failures > 5) {
+                        throw error;
+                    }
+                    await sleep(1000 * failures);
+                    const statusResponse = await fetch(session.status_url).catch(() => null);
+                    if (statusResponse && statusResponse.ok) {
+                        offset = (await statusResponse.json()).offset;
+                    }
+                }
+            }
+            const response = await fetch(session.finalize_url, { method: 'POST' });
+            const result = await response.json();
+            if (response.ok) {
+                localStorage.removeItem(resumeKey(file));
+            }
+            return { response, result };
+        }
+
         uploadForm.addEventListener('submit', async function(event) {
             event.preventDefault();
-            const formData = new FormData(uploadForm);
+            const file = videoInput.files[0];
+            if (!file) {
+                return;
+            }
             uploadStatus.innerHTML = '<p>Yükleniyor...</p>';
             try {
-                const response = await fetch("{{ url_for('upload_video_route') }}", { method: 'POST', body: formData });
-                const result = await response.json();
-                if (response.ok && result.video_id) {
-                    uploadStatus.innerHTML = `<p class="success">${result.message} (Video ID: ${result.video_id}). <a href="/result/${result.video_id}" target="_blank">Analizi Gör</a></p><p><button onclick="location.reload()">Listeyi Güncelle</button></p>`;
+                const { response, result } = await uploadInChunks(file);
+                if (response.ok && result.duplicate) {
+                    uploadStatus.innerHTML = `<p class="success">${result.message} (Video ID: ${result.video_id}). <a href="${result.result_url}" target="_blank">Analizi Gör</a></p>`;
+                    videoInput.value = "";
+                } else if (response.status === 202 && result.job_id) {
+                    uploadStatus.innerHTML = `<p>${result.message} (İş ID: ${result.job_id})</p>`;
                     videoInput.value = "";
+                    pollJob(result.status_url);
                 } else {
                     const errorMessage = result.error || 'Bilinmeyen bir hata oluştu.';
                     const errorDetails = result.details || (result.status_code ? `HTTP Status: ${result.status_code}` : (result.message || ''));
@@ -279,91 +2521,596 @@ def home():
         </script>
     </body>
     </html>
-    """, videos=video_list)
+"""
+HOME_TEMPLATE = app.jinja_env.from_string(HOME_TEMPLATE_SOURCE)
+HOME_TEMPLATE_VERSION = hashlib.sha1(HOME_TEMPLATE_SOURCE.encode('utf-8')).hexdigest()[:12]
 
-@app.route('/result/<video_id>', methods=['GET'])
-def get_result(video_id):
+def compute_etag(*parts):
+    """Sayfanın dayandığı verilerden kısa bir ETag üretir."""
+    raw = json.dumps(parts, default=str, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def conditional_response(etag, render):
+    """İstemcideki sürüm güncelse şablonu hiç render etmeden 304 döndürür."""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        with timed_stage('render'):
+            response = make_response(render())
+    response.set_etag(etag)
+    # Tarayıcı her seferinde sorsun ama 304 ile gövdeyi tekrar indirmesin
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/')
+def home():
+    status, filename_prefix, cursor, limit = _video_list_args()
+    video_list = []
+    next_cursor = None
+    try:
+        try:
+            video_list, next_cursor = query_video_page(status, filename_prefix, cursor, limit)
+        except ValueError:
+            # Bozuk cursor: ilk sayfayı göster
+            video_list, next_cursor = query_video_page(status, filename_prefix, None, limit)
+        for video in video_list:
+            video['_id'] = str(video['_id'])
+            if isinstance(video.get('upload_date'), datetime.datetime):
+                 video['upload_date'] = video['upload_date'].strftime("%Y-%m-%d %H:%M:%S UTC")
+    except Exception as e:
+        print(f"Videoları MongoDB'den çekerken hata: {e}")
+        record_error('mongo')
+
+    # Sayfadaki JS'e yazılan ayarlar da ETag'e girer; değiştiklerinde tarayıcı eski sayfayı kullanmasın
+    sse_url = video_events_url()
+    page_config = (UPLOAD_CHUNK_SIZE, LIVE_SEGMENT_SECONDS, SSE_FALLBACK_POLL_SECONDS, sse_url)
+    etag = compute_etag(HOME_TEMPLATE_VERSION, page_config, status, filename_prefix, cursor, next_cursor, [
+        (video.get('video_id'), video.get('filename'), video.get('upload_date'), video.get('status'),
+         video.get('processing_progress')) for video in video_list])
+    return conditional_response(etag, lambda: render_template(
+        HOME_TEMPLATE, videos=video_list, chunk_size=UPLOAD_CHUNK_SIZE, next_cursor=next_cursor, cursor=cursor,
+        status=status, filename_prefix=filename_prefix, status_filters=VIDEO_STATUS_FILTERS,
+        live_segment_seconds=LIVE_SEGMENT_SECONDS, sse_fallback_poll_seconds=SSE_FALLBACK_POLL_SECONDS,
+        sse_url=sse_url))
+
+# Azure'daki indeksleme durumu; 'Processed' olan sonuçlar artık değişmez.
+INDEX_STATE_PROCESSED = 'Processed'
+
+# Index yanıtı indirilirken bellekte tutulan blok boyutu
+INDEX_DOWNLOAD_BLOCK_SIZE = 256 * 1024
+# Ham Index dokümanları gzip'li olarak bu GridFS bucket'ında saklanır (16 MB doküman sınırı yok)
+RAW_INDEX_BUCKET = 'raw_index'
+
+def download_video_index(video_id):
+    """Azure'dan Index JSON'unu gzip'li bir geçici dosyaya akış olarak indirir.
+
+    (dosya_yolu, hata) döndürür; hata jsonify'a verilebilecek bir dict'tir. Yanıt hiçbir zaman
+    bütünüyle belleğe alınmaz. Flask uygulama bağlamı gerektirmez, arka plan işçilerinden de çağrılabilir.
+    """
     access_token = get_access_token()
     if not access_token:
-        return jsonify({'error': 'Azure Video Indexer token alınamadı veya yapılandırma eksik.'}), 500
-        
-    url = f"https://api.videoindexer.ai/{LOCATION}/Accounts/{ACCOUNT_ID}/Videos/{video_id}/Index?accessToken={access_token}"
-    
+        return None, {'error': 'Azure Video Indexer token alınamadı veya yapılandırma eksik.'}
+
+    with timed_stage('index_download'):
+        try:
+            azure_response = indexer_client.get_video_index(access_token, video_id, stream=True)
+            azure_response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Azure'dan analiz alınırken ağ hatası: {e}")
+            record_error('index_download')
+            return None, {'error': 'Azure\'dan analiz alınırken ağ hatası', 'details': str(e)}
+
+        if azure_response.status_code != 200:
+            record_error('index_download')
+            return None, {'error': 'Azure\'dan analiz alınamadı', 'status_code': azure_response.status_code, 'details': azure_response.text}
+
+        os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(UPLOAD_SPOOL_DIR, f"index-{uuid.uuid4().hex}.json.gz")
+        try:
+            with azure_response, gzip.open(path, 'wb', compresslevel=6) as index_file:
+                for block in azure_response.iter_content(INDEX_DOWNLOAD_BLOCK_SIZE):
+                    index_file.write(block)
+                    PAYLOAD_BYTES.labels('index_download').inc(len(block))
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"Azure'dan analiz alınırken ağ hatası: {e}")
+            record_error('index_download')
+            _remove_spool_file(path)
+            return None, {'error': 'Azure\'dan analiz alınırken ağ hatası', 'details': str(e)}
+    return path, None
+
+def parse_index_time(value):
+    """Azure'un 'H:MM:SS.fff' biçimindeki zamanını saniyeye çevirir."""
+    if not value:
+        return None
     try:
-        azure_response = requests.get(url, timeout=20) 
-        azure_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Azure'dan analiz alınırken ağ hatası: {e}")
-        return jsonify({'error': 'Azure\'dan analiz alınırken ağ hatası', 'details': str(e)}),500
+        seconds = 0.0
+        for part in value.split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except (ValueError, AttributeError):
+        return None
 
-    if azure_response.status_code != 200:
-        return jsonify({'error': 'Azure\'dan analiz alınamadı', 'status_code': azure_response.status_code, 'details': azure_response.text}), 500
-    
-    analysis_data = azure_response.json()
-    
-    # Analiz verisinden Anahtar Kelimeleri ve Konuları ayıklama
-    extracted_keywords = []
-    extracted_topics = []
-    
-    # JSON yapısı videodan videoya veya API versiyonuna göre değişebilir, kontroller ekleyelim
-    # insights genellikle summarizedInsights içinde veya doğrudan olabilir.
-    insights = analysis_data.get('videos', [{}])[0].get('insights', {})
-    if not insights: # Eğer ana 'insights' yoksa, eski bir yapı veya farklı bir JSON formatı olabilir.
-        insights = analysis_data.get('summarizedInsights', {})
-
-    if insights:
-        keywords_data = insights.get('keywords', [])
-        for kw in keywords_data:
-            extracted_keywords.append(kw.get('text', '-')) # Sadece text'i al, yoksa '-' koy
-            
-        topics_data = insights.get('topics', [])
-        for topic in topics_data:
-            extracted_topics.append(topic.get('name', '-')) # Sadece name'i al, yoksa '-' koy
-            
-    # MongoDB'de durumu güncelle (Bu kısım aynı kalıyor)
+class InsightTimeline:
+    """Tüm insight örneklerini sütunlar halinde tutar.
+
+    Metinler bir kez saklanır (interning) ve her örnek için sadece tamsayı kimliği tutulur;
+    tür, başlangıç, bitiş ve güven değerleri array modülünün sıkışık dizilerindedir.
+    """
+
+    KINDS = ['keyword', 'topic', 'label', 'face', 'ocr', 'transcript', 'scene', 'shot', 'brand',
+             'person', 'location', 'emotion', 'sentiment', 'audio_effect']
+    _KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+    def __init__(self):
+        self.strings = []
+        self._string_ids = {}
+        self.kinds = array('B')
+        self.texts = array('I')
+        self.confidences = array('f')
+        self.starts = array('f')  # Zaman bilgisi yoksa NaN
+        self.ends = array('f')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add(self, kind, text, confidence, start, end):
+        self.kinds.append(self._KIND_CODES[kind])
+        self.texts.append(self._intern(text))
+        self.confidences.append(1.0 if confidence is None else float(confidence))
+        self.starts.append(math.nan if start is None else start)
+        self.ends.append(math.nan if end is None else end)
+
+    def __iter__(self):
+        """Örnekleri (tür, metin, güven, başlangıç_sn, bitiş_sn) demetleri olarak üretir."""
+        for kind, text, confidence, start, end in zip(self.kinds, self.texts, self.confidences, self.starts, self.ends):
+            yield (self.KINDS[kind], self.strings[text], confidence,
+                   None if math.isnan(start) else start, None if math.isnan(end) else end)
+
+    def unique_texts(self, kind):
+        """Bir türün farklı metinlerini ilk görülme sırasıyla döndürür."""
+        code = self._KIND_CODES[kind]
+        seen = {}
+        for kind_code, text in zip(self.kinds, self.texts):
+            if kind_code == code and text not in seen:
+                seen[text] = None
+        return [self.strings[text] for text in seen]
+
+    # Sütunların saklanan biçimi (NumPy dtype gösterimi): makineden bağımsız olarak little-endian
+    COLUMN_DTYPES = {'kind': '|u1', 'text': '<u4', 'confidence': '<f4', 'start': '<f4', 'end': '<f4'}
+    _COLUMN_TYPECODES = {'kind': 'B', 'text': 'I', 'confidence': 'f', 'start': 'f', 'end': 'f'}
+    _COLUMN_ATTRIBUTES = {'kind': 'kinds', 'text': 'texts', 'confidence': 'confidences', 'start': 'starts', 'end': 'ends'}
+
+    def to_document(self):
+        """MongoDB'ye yazılacak sıkışık biçim: sütunlar COLUMN_DTYPES'taki türlerde ham bayt olarak."""
+        document = {
+            'count': len(self),
+            'kinds': self.KINDS,
+            'strings': self.strings,
+            'dtypes': dict(self.COLUMN_DTYPES),
+        }
+        for column, attribute in self._COLUMN_ATTRIBUTES.items():
+            values = getattr(self, attribute)
+            if sys.byteorder == 'big' and values.itemsize > 1:
+                values = array(values.typecode, values)
+                values.byteswap()
+            document[column] = Binary(values.tobytes())
+        return document
+
+    @classmethod
+    def from_document(cls, document):
+        """to_document() çıktısından zaman çizelgesini geri kurar."""
+        dtypes = document.get('dtypes')
+        if dtypes != cls.COLUMN_DTYPES:
+            raise ValueError(f"Desteklenmeyen zaman çizelgesi biçimi: {dtypes}")
+        timeline = cls()
+        timeline.strings = list(document['strings'])
+        timeline._string_ids = {text: string_id for string_id, text in enumerate(timeline.strings)}
+        # Kayıttaki tür listesi bu sürümünkinden farklı sırada olabilir
+        kind_codes = [cls._KIND_CODES[kind] for kind in document['kinds']]
+        for column, attribute in cls._COLUMN_ATTRIBUTES.items():
+            values = array(cls._COLUMN_TYPECODES[column])
+            values.frombytes(document[column])
+            if sys.byteorder == 'big' and values.itemsize > 1:
+                values.byteswap()
+            if len(values) != document['count']:
+                raise ValueError(f"Zaman çizelgesi sütunu '{column}' {len(values)} değer içeriyor, "
+                                 f"{document['count']} bekleniyordu")
+            setattr(timeline, attribute, values)
+        timeline.kinds = array('B', (kind_codes[code] for code in timeline.kinds))
+        return timeline
+
+# insights anahtarı -> (zaman çizelgesindeki tür, metin alanı)
+TIMELINE_INSIGHT_FIELDS = {
+    'keywords': ('keyword', 'text'),
+    'topics': ('topic', 'name'),
+    'labels': ('label', 'name'),
+    'faces': ('face', 'name'),
+    'ocr': ('ocr', 'text'),
+    'transcript': ('transcript', 'text'),
+    'scenes': ('scene', 'id'),
+    'shots': ('shot', 'id'),
+    'brands': ('brand', 'name'),
+    'namedPeople': ('person', 'name'),
+    'namedLocations': ('location', 'name'),
+    'emotions': ('emotion', 'type'),
+    'sentiments': ('sentiment', 'sentimentType'),
+    'audioEffects': ('audio_effect', 'type'),
+}
+_VIDEO_INSIGHT_PREFIXES = {f'videos.item.insights.{key}.item': key for key in TIMELINE_INSIGHT_FIELDS}
+_SUMMARIZED_INSIGHT_PREFIXES = {f'summarizedInsights.{key}.item': key for key in TIMELINE_INSIGHT_FIELDS}
+
+IndexExtraction = collections.namedtuple('IndexExtraction', ['state', 'progress', 'timeline'])
+
+def _add_insight_item(timeline, insight_key, item):
+    """Tek bir insight öğesinin tüm örneklerini zaman çizelgesine ekler."""
+    kind, text_field = TIMELINE_INSIGHT_FIELDS[insight_key]
+    text = item.get(text_field)
+    if text is None or text == '':
+        return
+    if kind in ('scene', 'shot'):
+        text = f"{kind} {text}"
+    item_confidence = item.get('confidence')
+    instances = item.get('instances') or item.get('appearances') or [{}]
+    for instance in instances:
+        confidence = instance.get('confidence', item_confidence)
+        if 'startSeconds' in instance:  # summarizedInsights 'appearances' biçimi
+            start, end = instance.get('startSeconds'), instance.get('endSeconds')
+            start = None if start is None else float(start)
+            end = None if end is None else float(end)
+        else:
+            start, end = parse_index_time(instance.get('start')), parse_index_time(instance.get('end'))
+        timeline.add(kind, str(text), confidence, start, end)
+
+class _ItemSink:
+    """items_basecoro'nun hedefi: tamamlanan öğeleri biriktirir."""
+
+    def __init__(self):
+        self.items = []
+
+    def send(self, item):
+        self.items.append(item)
+
+def _iter_index_items_ijson(index_file, header):
+    """ijson ile Index'i tek geçişte okur; aynı anda sadece tek bir insight öğesi nesneye dönüştürülür.
+
+    Öğeler, ijson backend'inin (yajl2_c kuruluysa C) items_basecoro'su ile kurulur; öneki eşleştirmek ve
+    nesneyi oluşturmak Python'da olay olay ObjectBuilder çalıştırmaktan belirgin şekilde hızlıdır.
+    """
+    items_basecoro = ijson.get_backend(ijson.backend).items_basecoro
+    sink = _ItemSink()
+    builders = {}
+    events = ijson.parse(index_file, use_float=True)
+    for prefix, event, value in events:
+        if event == 'start_map' and (prefix in _VIDEO_INSIGHT_PREFIXES or prefix in _SUMMARIZED_INSIGHT_PREFIXES):
+            builder = builders.get(prefix)
+            if builder is None:
+                builder = builders[prefix] = items_basecoro(sink, prefix)
+            builder.send((prefix, event, value))
+            # Öğenin olaylarını iç döngüde tüket; öğe tamamlanınca sink'e düşer, dış döngüye dön
+            for item_event in events:
+                builder.send(item_event)
+                if sink.items:
+                    break
+            yield prefix, sink.items.pop()
+        elif prefix == 'state' and event == 'string':
+            header['state'] = value
+        elif prefix == 'videos.item.processingProgress' and event == 'string':
+            header.setdefault('progress', value)
+
+def _iter_index_items_json(index_file, header):
+    """ijson kurulu değilse: dokümanı bir kerede yükleyip aynı öğeleri üretir (bellek kullanımı yüksek)."""
+    analysis_data = json.load(index_file)
+    header['state'] = analysis_data.get('state')
+    videos = analysis_data.get('videos') or []
+    if videos:
+        header['progress'] = videos[0].get('processingProgress')
+    for video in videos:
+        insights = video.get('insights') or {}
+        for key in TIMELINE_INSIGHT_FIELDS:
+            for item in insights.get(key) or []:
+                yield f'videos.item.insights.{key}.item', item
+    summarized = analysis_data.get('summarizedInsights') or {}
+    for key in TIMELINE_INSIGHT_FIELDS:
+        for item in summarized.get(key) or []:
+            yield f'summarizedInsights.{key}.item', item
+
+# JSON olmayan (ör. ağ geçidinin HTML hata sayfası) veya yarım kalmış gövdeler. ijson'un hataları
+# ValueError'dan türemez; json.JSONDecodeError ValueError'dır, bozuk gzip OSError/EOFError verir.
+INDEX_PARSE_ERRORS = (ValueError, OSError, EOFError) + ((ijson.JSONError,) if ijson is not None else ())
+
+def parse_index_file(path):
+    """gzip'li Index dosyasını akış olarak ayrıştırıp IndexExtraction döndürür."""
+    header = {}
+    timeline = InsightTimeline()
+    # Video insights'ı yoksa (eski API biçimi) summarizedInsights kullanılır
+    summarized_timeline = InsightTimeline()
+    iter_items = _iter_index_items_ijson if ijson is not None else _iter_index_items_json
+    with gzip.open(path, 'rb') as index_file:
+        for prefix, item in iter_items(index_file, header):
+            if prefix in _VIDEO_INSIGHT_PREFIXES:
+                _add_insight_item(timeline, _VIDEO_INSIGHT_PREFIXES[prefix], item)
+            else:
+                _add_insight_item(summarized_timeline, _SUMMARIZED_INSIGHT_PREFIXES[prefix], item)
+    if not len(timeline):
+        timeline = summarized_timeline
+    return IndexExtraction(header.get('state'), header.get('progress'), timeline)
+
+def fetch_video_index(video_id):
+    """Index'i indirip ayrıştırır. (IndexExtraction, gzip'li ham dosya yolu, hata) döndürür.
+
+    Dosyayı silmek çağıranın sorumluluğundadır.
+    """
+    path, error = download_video_index(video_id)
+    if error is not None:
+        return None, None, error
+    parsed = False
+    try:
+        with timed_stage('index_parse'):
+            extraction = parse_index_file(path)
+        parsed = True
+    except INDEX_PARSE_ERRORS as e:
+        print(f"Video {video_id} için analiz verisi ayrıştırılamadı: {e}")
+        record_error('index_parse')
+        return None, None, {'error': 'Azure\'dan gelen analiz verisi ayrıştırılamadı', 'details': str(e)}
+    finally:
+        if not parsed:
+            _remove_spool_file(path)
+    return extraction, path, None
+
+def store_raw_index(video_id, path):
+    """gzip'li ham Index dosyasını GridFS'e yazar ve eski sürümleri siler. Dosya kimliğini döndürür."""
+    client = get_mongo_client()
+    if client is None or not MONGODB_DB_NAME:
+        return None
+    bucket = gridfs.GridFSBucket(client[MONGODB_DB_NAME], bucket_name=RAW_INDEX_BUCKET)
+    old_files = [grid_file._id for grid_file in bucket.find({'filename': video_id})]
+    with open(path, 'rb') as raw_file:
+        file_id = bucket.upload_from_stream(video_id, raw_file, metadata={'contentEncoding': 'gzip'})
+    for old_file_id in old_files:
+        bucket.delete(old_file_id)
+    return file_id
+
+# Arama indeksine alınan insight türleri ve sıralamadaki ağırlıkları
+SEARCH_KIND_WEIGHTS = {
+    'keyword': 2.0,
+    'topic': 2.0,
+    'label': 1.0,
+    'person': 1.0,
+    'brand': 1.0,
+    'location': 1.0,
+    'transcript': 1.0,
+    'ocr': 0.8,
+}
+# Bir terim için saklanan en fazla zaman aralığı sayısı
+SEARCH_MAX_HITS_PER_TERM = int(os.getenv('SEARCH_MAX_HITS_PER_TERM', '50'))
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+# Bir aramada videolara göre gruplanan en fazla terim sayısı: eşleşen terimlerin en yüksek puanlıları alınır.
+# Sıralama+sınır MongoDB'de sınırlı bellekli top-k olarak çalışır; $group tüm eşleşmeler yerine bunları işler.
+# Video puanları bu adaylardan hesaplanır, sayfalar da bu adaylarla sınırlıdır.
+SEARCH_MAX_CANDIDATE_TERMS = int(os.getenv('SEARCH_MAX_CANDIDATE_TERMS', '2000'))
+
+def build_search_documents(video_id, instances):
+    """Aynı (tür, metin) çiftinin tüm örneklerini tek bir arama dokümanında toplar."""
+    terms = {}
+    for kind, text, confidence, start, end in instances:
+        if kind not in SEARCH_KIND_WEIGHTS:
+            continue
+        term = terms.get((kind, text))
+        if term is None:
+            term = terms[(kind, text)] = {
+                'video_id': video_id,
+                'kind': kind,
+                'text': text,
+                'weight': SEARCH_KIND_WEIGHTS[kind],
+                'confidence': 0.0,
+                'hit_count': 0,
+                'hits': [],
+            }
+        term['confidence'] = max(term['confidence'], float(confidence))
+        term['hit_count'] += 1
+        if start is not None and len(term['hits']) < SEARCH_MAX_HITS_PER_TERM:
+            term['hits'].append({'start': round(start, 2), 'end': round(end if end is not None else start, 2)})
+    return list(terms.values())
+
+def index_video_insights(video_id, instances):
+    """Bir videonun arama indeksini (search_terms) baştan yazar; sadece bu videonun dokümanları değişir."""
+    search_collection = get_db_collection('search_terms')
+    if search_collection is None:
+        print("Arama indeksi güncellenemedi: veritabanı collection alınamadı.")
+        return
+    documents = build_search_documents(video_id, instances)
+    try:
+        search_collection.delete_many({'video_id': video_id})
+        if documents:
+            search_collection.insert_many(documents, ordered=False)
+    except Exception as e:
+        print(f"Arama indeksi güncelleme hatası: {e}")
+
+def save_analysis_result(video_id, extraction, raw_path=None, update_video_status=True):
+    """Ayıklanan sonuçları ve zaman çizelgesini 'results' collection'ına, ham Index'i GridFS'e yazar,
+    video durumunu günceller.
+
+    Kaydedilen dokümanı döndürür (veritabanı yoksa da şablon için kullanılabilir).
+    """
+    state = extraction.state
+    # MongoDB tarihleri milisaniye hassasiyetinde saklar; ETag'e giren değer okunduğunda da aynı kalsın
+    now = datetime.datetime.utcnow()
+    result_document = {
+        'video_id': video_id,
+        'state': state,
+        'keywords': extraction.timeline.unique_texts('keyword'),
+        'topics': extraction.timeline.unique_texts('topic'),
+        'timeline': extraction.timeline.to_document(),
+        'raw_index_file_id': None,
+        'has_index': False,
+        'updated_at': now.replace(microsecond=now.microsecond // 1000 * 1000),
+    }
+
+    results_collection = get_db_collection('results')
+    if results_collection is None:
+        print("Analiz sonucu alınırken veritabanı collection alınamadı, sonuç saklanamadı.")
+        return result_document
+    if raw_path is not None:
+        try:
+            with timed_stage('mongo_gridfs'):
+                result_document['raw_index_file_id'] = store_raw_index(video_id, raw_path)
+            result_document['has_index'] = result_document['raw_index_file_id'] is not None
+        except Exception as e:
+            print(f"Ham analiz verisi GridFS'e yazılamadı: {e}")
+            record_error('mongo')
+    try:
+        with timed_stage('mongo_update'):
+            results_collection.replace_one({'video_id': video_id}, result_document, upsert=True)
+    except DocumentTooLarge:
+        # Çok uzun videolarda zaman çizelgesi bile 16 MB sınırını aşabilir; ayıklanmış listeleri yine de sakla.
+        print(f"Video {video_id} için zaman çizelgesi çok büyük, sadece ayıklanmış sonuçlar saklanıyor.")
+        try:
+            results_collection.replace_one({'video_id': video_id}, dict(result_document, timeline=None), upsert=True)
+        except Exception as e:
+            print(f"MongoDB sonuç kayıt hatası: {e}")
+            record_error('mongo')
+    except Exception as e:
+        print(f"MongoDB sonuç kayıt hatası: {e}")
+        record_error('mongo')
+
+    if state == INDEX_STATE_PROCESSED:
+        with timed_stage('search_index'):
+            index_video_insights(video_id, extraction.timeline)
+
+    if not update_video_status:
+        return result_document
+
+    # MongoDB'de video durumunu Azure'un bildirdiği gerçek duruma güncelle
     videos_collection = get_db_collection('videos')
     if videos_collection is None:
         print("Analiz sonucu alınırken veritabanı collection alınamadı, durum güncellenemedi.")
     else:
+        new_status = state or 'Processing'
         try:
-            update_result = videos_collection.update_one(
-                {'video_id': video_id},
-                {'$set': {'status': 'Analyzed'}}
-            )
+            with timed_stage('mongo_update'):
+                update_result = videos_collection.update_one(
+                    {'video_id': video_id},
+                    {'$set': {'status': new_status, 'processing_progress': extraction.progress}}
+                )
             if update_result.matched_count > 0:
-                print(f"Video {video_id} durumu MongoDB'de 'Analyzed' olarak güncellendi.")
+                print(f"Video {video_id} durumu MongoDB'de '{new_status}' olarak güncellendi.")
+                if update_result.modified_count > 0:
+                    publish_video_update({'video_id': video_id, 'status': new_status,
+                                          'processing_progress': extraction.progress})
             else:
                 print(f"MongoDB'de {video_id} ID'li video bulunamadı, durum güncellenemedi.")
         except Exception as e:
             print(f"MongoDB durum güncelleme hatası: {e}")
+            record_error('mongo')
 
-    # Şablona göndermek için context oluştur
-    template_context = {
-        "video_id": video_id,
-        "keywords": extracted_keywords,
-        "topics": extracted_topics,
-        "full_analysis_json": analysis_data # Ham JSON'u da hala gönderebiliriz, belki alta bir yere koyarız
-    }
-    
-    # Şimdilik basit bir HTML stringi içinde gösterelim, daha sonra bunu render_template_string'e taşıyacağız.
-    # Bu kısım bir sonraki adımda render_template_string içinde güncellenecek.
-    html_content = f"""    <h1>Analiz Sonuçları: {video_id}</h1>
-    <h2>Anahtar Kelimeler</h2>
-    <ul>{"<li>" + "</li><li>".join(extracted_keywords) + "</li>" if extracted_keywords else "<li>Bulunamadı</li>"}</ul>
-    <h2>Konular</h2>
-    <ul>{"<li>" + "</li><li>".join(extracted_topics) + "</li>" if extracted_topics else "<li>Bulunamadı</li>"}</ul>
-    <hr>
-    <h3>Ham Analiz Verisi (JSON)</h3>
-    <pre>{analysis_data}</pre>
+    return result_document
+
+# İndeksleme durumu sorgulayıcısı ayarları
+INDEX_POLL_ENABLED = os.getenv('INDEX_POLL_ENABLED', '1') == '1'
+INDEX_POLL_INTERVAL_SECONDS = float(os.getenv('INDEX_POLL_INTERVAL_SECONDS', '10'))
+INDEX_POLL_BATCH_SIZE = int(os.getenv('INDEX_POLL_BATCH_SIZE', '100'))
+INDEX_POLL_CONCURRENCY = int(os.getenv('INDEX_POLL_CONCURRENCY', '4'))
+INDEX_POLL_MIN_BACKOFF_SECONDS = float(os.getenv('INDEX_POLL_MIN_BACKOFF_SECONDS', '30'))
+INDEX_POLL_MAX_BACKOFF_SECONDS = float(os.getenv('INDEX_POLL_MAX_BACKOFF_SECONDS', '900'))
+# Tüm sorgulayıcı için Azure'a saniyede en fazla bu kadar istek
+INDEX_POLL_RATE_PER_SECOND = float(os.getenv('INDEX_POLL_RATE_PER_SECOND', '2'))
+
+# Bu durumlardaki videolar bir daha sorgulanmaz ('Analyzed' eski kayıtlardan kalma)
+TERMINAL_VIDEO_STATUSES = [INDEX_STATE_PROCESSED, 'Failed', 'Analyzed']
+
+_index_poll_limiter = RateLimiter(INDEX_POLL_RATE_PER_SECOND)
+
+def _next_poll_backoff(video, changed):
+    """Durum değiştiyse en kısa aralığa dön, değişmediyse aralığı ikiye katla."""
+    if changed:
+        return INDEX_POLL_MIN_BACKOFF_SECONDS
+    previous = video.get('poll_backoff') or INDEX_POLL_MIN_BACKOFF_SECONDS
+    return min(INDEX_POLL_MAX_BACKOFF_SECONDS, previous * 2)
+
+def poll_video_state(video):
+    """Tek bir videonun durumunu Azure'dan sorgular.
+
+    (uygulanacak UpdateOne işlemi, durum değiştiyse istemcilere gidecek olay veya None) döndürür.
+    Hata olsa bile her zaman bir UpdateOne döner; hatalı video geri çekilir, toplu yazım diğerlerini kaybetmez.
     """
-    # return html_content # Direkt HTML döndürmek yerine render_template_string kullanacağız.
-    # Geçici olarak, sadece JSON döndürmeye devam edelim ki adımları tek tek görelim.
-    # Bir sonraki adımda bu HTML'i render_template_string ile birleştireceğiz.
-    # return jsonify(analysis_data) # ESKİ HALİ
-
-    # Yeni hali: Ayıklanmış verilerle birlikte render_template_string kullanacağız.
-    # Şimdilik, '/result/' sayfası için ayrı bir HTML yapısı oluşturalım ve render_template_string kullanalım.
-    return render_template_string("""
+    _index_poll_limiter.acquire()
+    now = datetime.datetime.utcnow()
+    event = None
+    raw_path = None
+    try:
+        extraction, raw_path, error = fetch_video_index(video['video_id'])
+        if error is not None:
+            backoff = _next_poll_backoff(video, changed=False)
+            update = {'poll_error': error.get('details') or error.get('error')}
+        else:
+            state = extraction.state or video.get('status')
+            progress = extraction.progress
+            changed = state != video.get('status') or progress != video.get('processing_progress')
+            backoff = _next_poll_backoff(video, changed)
+            update = {'status': state, 'processing_progress': progress, 'poll_error': None}
+            if changed:
+                event = {'video_id': video['video_id'], 'status': state, 'processing_progress': progress}
+            if state == INDEX_STATE_PROCESSED:
+                # Sonuç artık değişmeyeceği için hemen sakla; /result sayfası Azure'a gitmeden açılır
+                save_analysis_result(video['video_id'], extraction, raw_path, update_video_status=False)
+    except Exception as e:
+        print(f"Video {video['video_id']} durumu sorgulanamadı: {e}")
+        record_error('index_poll')
+        # Durum yazılmaz; sonuç kaydedilemediyse video bir sonraki turda tekrar işlenir
+        event = None
+        backoff = _next_poll_backoff(video, changed=False)
+        update = {'poll_error': str(e)[-500:]}
+    finally:
+        if raw_path is not None:
+            _remove_spool_file(raw_path)
+    update.update({
+        'last_polled_at': now,
+        'poll_backoff': backoff,
+        'next_poll_at': now + datetime.timedelta(seconds=backoff * random.uniform(0.8, 1.2)),
+    })
+    return UpdateOne({'_id': video['_id']}, {'$set': update}), event
+
+def poll_index_states_once(executor):
+    """Sırası gelmiş, henüz bitmemiş videoları sorgular. Sorgulanan video sayısını döndürür."""
+    videos_collection = get_db_collection('videos')
+    if videos_collection is None:
+        return 0
+    now = datetime.datetime.utcnow()
+    due_videos = list(videos_collection.find(
+        {'status': {'$nin': TERMINAL_VIDEO_STATUSES},
+         '$or': [{'next_poll_at': {'$lte': now}}, {'next_poll_at': {'$exists': False}}]},
+        {'video_id': 1, 'status': 1, 'processing_progress': 1, 'poll_backoff': 1},
+    ).sort('next_poll_at', 1).limit(INDEX_POLL_BATCH_SIZE))
+    if not due_videos:
+        return 0
+    polled = list(executor.map(poll_video_state, due_videos))
+    videos_collection.bulk_write([operation for operation, _ in polled], ordered=False)
+    # Sadece durumu gerçekten değişen satırlar istemcilere gönderilir
+    for _, event in polled:
+        if event is not None:
+            publish_video_update(event)
+    return len(polled)
+
+def index_poller_loop():
+    with ThreadPoolExecutor(max_workers=INDEX_POLL_CONCURRENCY, thread_name_prefix='index-poll') as executor:
+        while True:
+            polled = 0
+            try:
+                polled = poll_index_states_once(executor)
+            except Exception as e:
+                print(f"İndeksleme durumu sorgulama hatası: {e}")
+            # Tam bir parti geldiyse sırada bekleyen başka videolar olabilir, beklemeden devam et
+            if polled < INDEX_POLL_BATCH_SIZE:
+                time.sleep(INDEX_POLL_INTERVAL_SECONDS)
+
+RESULT_TEMPLATE_SOURCE = """
     <!DOCTYPE html>
     <html lang="tr">
     <head>
@@ -412,14 +3159,446 @@ def get_result(video_id):
             
             <hr style="margin: 30px 0;">
             <h3>Ham Analiz Verisi (JSON)</h3>
-            <details>
+            {% if has_raw_json %}
+            <details id="rawJsonDetails">
                 <summary>Göstermek için tıkla</summary>
-                <pre>{{ full_analysis_json | tojson(indent=2) }}</pre>
+                <pre id="rawJson">Yükleniyor...</pre>
             </details>
+            {% else %}
+            <p>Ham analiz verisi saklanmamış.</p>
+            {% endif %}
         </div>
+
+        <script>
+        // Ham JSON büyük olabilir; sadece bölüm açıldığında (sıkıştırılmış olarak) indir
+        const rawJsonDetails = document.getElementById('rawJsonDetails');
+        if (rawJsonDetails) {
+            rawJsonDetails.addEventListener('toggle', async function() {
+                if (!rawJsonDetails.open || rawJsonDetails.dataset.loaded) {
+                    return;
+                }
+                rawJsonDetails.dataset.loaded = '1';
+                const rawJson = document.getElementById('rawJson');
+                try {
+                    const response = await fetch("{{ url_for('get_raw_result', video_id=video_id) }}");
+                    rawJson.textContent = response.ok
+                        ? JSON.stringify(await response.json(), null, 2)
+                        : `Ham veri alınamadı (HTTP ${response.status})`;
+                } catch (error) {
+                    rawJson.textContent = `Ham veri alınamadı: ${error}`;
+                    delete rawJsonDetails.dataset.loaded;
+                }
+            });
+        }
+        </script>
     </body>
     </html>
-    """, video_id=video_id, keywords=extracted_keywords, topics=extracted_topics, full_analysis_json=analysis_data)
+"""
+RESULT_TEMPLATE = app.jinja_env.from_string(RESULT_TEMPLATE_SOURCE)
+RESULT_TEMPLATE_VERSION = hashlib.sha1(RESULT_TEMPLATE_SOURCE.encode('utf-8')).hexdigest()[:12]
+
+# Ham JSON akışında sıkıştırıcıya verilen tampon boyutu
+RAW_JSON_BUFFER_SIZE = 64 * 1024
+
+def _select_content_encoding():
+    """İstemcinin kabul ettiği en iyi sıkıştırmayı seçer ('br', 'gzip' veya None)."""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+def _iter_compressed_json(document, encoding):
+    """Dokümanı parça parça JSON'a çevirip sıkıştırarak üretir; tüm çıktı bellekte birikmez."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        compress, flush = compressor.process, compressor.finish
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compress, flush = compressor.compress, compressor.flush
+    else:
+        compress, flush = (lambda data: data), (lambda: b'')
+
+    buffer = []
+    buffered = 0
+    for fragment in json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(document):
+        buffer.append(fragment)
+        buffered += len(fragment)
+        if buffered >= RAW_JSON_BUFFER_SIZE:
+            chunk = compress(''.join(buffer).encode('utf-8'))
+            buffer, buffered = [], 0
+            if chunk:
+                yield chunk
+    chunk = compress(''.join(buffer).encode('utf-8')) + flush()
+    if chunk:
+        yield chunk
+
+def _iter_grid_file(grid_out, decompress=False):
+    """GridFS dosyasını bloklar halinde okur; istenirse gzip'i akış olarak açar."""
+    decompressor = zlib.decompressobj(31) if decompress else None
+    try:
+        while True:
+            block = grid_out.read(RAW_JSON_BUFFER_SIZE)
+            if not block:
+                break
+            if decompressor is not None:
+                block = decompressor.decompress(block)
+            if block:
+                yield block
+        if decompressor is not None:
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+    finally:
+        grid_out.close()
+
+@app.route('/result/<video_id>/raw', methods=['GET'])
+def get_raw_result(video_id):
+    results_collection = get_db_collection('results')
+    if results_collection is None:
+        return jsonify({'error': 'Veritabanı bağlantısı/collection alınamadı'}), 500
+    try:
+        stored_result = results_collection.find_one(
+            {'video_id': video_id}, {'raw_index_file_id': 1, 'index': 1, 'updated_at': 1})
+    except Exception as e:
+        print(f"Ham analiz verisi MongoDB'den okunurken hata: {e}")
+        return jsonify({'error': 'Ham analiz verisi okunamadı', 'details': str(e)}), 500
+    if stored_result is None or (stored_result.get('raw_index_file_id') is None and stored_result.get('index') is None):
+        return jsonify({'error': 'Bu video için saklanmış ham analiz verisi yok'}), 404
+
+    etag = compute_etag('raw', video_id, stored_result.get('updated_at'))
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    elif stored_result.get('raw_index_file_id') is not None:
+        # Ham Index GridFS'te zaten gzip'li; istemci gzip kabul ediyorsa olduğu gibi gönder
+        bucket = gridfs.GridFSBucket(get_mongo_client()[MONGODB_DB_NAME], bucket_name=RAW_INDEX_BUCKET)
+        try:
+            grid_out = bucket.open_download_stream(stored_result['raw_index_file_id'])
+        except gridfs.errors.NoFile:
+            return jsonify({'error': 'Bu video için saklanmış ham analiz verisi yok'}), 404
+        send_gzip = request.accept_encodings['gzip'] > 0
+        response = app.response_class(
+            stream_with_context(_iter_grid_file(grid_out, decompress=not send_gzip)),
+            mimetype='application/json')
+        if send_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    else:
+        # Eski kayıtlar: Index dokümanı sonuç dokümanının içinde
+        encoding = _select_content_encoding()
+        response = app.response_class(
+            stream_with_context(_iter_compressed_json(stored_result['index'], encoding)),
+            mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/result/<video_id>', methods=['GET'])
+def get_result(video_id):
+    # ?refresh=1 saklanan sonucu yok sayıp Azure'dan yeniden çeker
+    force_refresh = request.args.get('refresh') == '1'
+
+    stored_result = None
+    results_collection = get_db_collection('results')
+    if results_collection is not None and not force_refresh:
+        try:
+            # Ham Index ve zaman çizelgesi (megabaytlarca olabilir) burada çekilmez. has_index alanı
+            # olmayan eski kayıtlarda Index'in varlığı sadece küçük 'index.id' alanından anlaşılır.
+            with timed_stage('mongo_query'):
+                stored_result = results_collection.find_one({'video_id': video_id}, {
+                    'state': 1, 'keywords': 1, 'topics': 1, 'updated_at': 1, 'has_index': 1, 'index.id': 1})
+        except Exception as e:
+            print(f"Analiz sonucu MongoDB'den okunurken hata: {e}")
+            record_error('mongo')
+
+    # Azure'a sadece sonuç yoksa veya hâlâ işleniyorsa git
+    if stored_result is None or stored_result.get('state') != INDEX_STATE_PROCESSED:
+        extraction, raw_path, error = fetch_video_index(video_id)
+        if error is not None:
+            if stored_result is None:
+                return jsonify(error), 500
+            print(f"Azure'a ulaşılamadı, video {video_id} için saklanan sonuç gösteriliyor.")
+        else:
+            try:
+                stored_result = save_analysis_result(video_id, extraction, raw_path)
+            finally:
+                _remove_spool_file(raw_path)
+
+    extracted_keywords = stored_result.get('keywords', [])
+    extracted_topics = stored_result.get('topics', [])
+    # Ham Index sayfaya gömülmez, /raw uç noktasından ayrıca indirilir
+    has_raw_json = bool(stored_result.get('has_index') or stored_result.get('index'))
+
+    etag = compute_etag(RESULT_TEMPLATE_VERSION, video_id, stored_result.get('state'), stored_result.get('updated_at'))
+    return conditional_response(etag, lambda: render_template(
+        RESULT_TEMPLATE, video_id=video_id, keywords=extracted_keywords, topics=extracted_topics,
+        has_raw_json=has_raw_json))
+
+def search_videos(query, kind=None, page=1, limit=SEARCH_PAGE_SIZE):
+    """Metin araması yapar ve sonuçları video bazında sıralar. (sonuçlar, devamı_var_mı) döndürür.
+
+    Bir terimin puanı = metin skoru x tür ağırlığı x (0.5 + güven); videonun puanı, en yüksek puanlı
+    SEARCH_MAX_CANDIDATE_TERMS terim içindeki terimlerinin puanları toplamıdır.
+    """
+    search_collection = get_db_collection('search_terms')
+    if search_collection is None:
+        raise RuntimeError('Veritabanı bağlantısı/collection alınamadı')
+
+    match = {'$text': {'$search': query}}
+    if kind:
+        match['kind'] = kind
+    pipeline = [
+        {'$match': match},
+        {'$project': {
+            'video_id': 1, 'kind': 1, 'text': 1, 'hit_count': 1,
+            'hits': {'$slice': ['$hits', 5]},
+            'score': {'$multiply': [{'$meta': 'textScore'}, '$weight', {'$add': [0.5, '$confidence']}]},
+        }},
+        {'$sort': {'score': -1}},
+        {'$limit': SEARCH_MAX_CANDIDATE_TERMS},
+        {'$group': {
+            '_id': '$video_id',
+            'score': {'$sum': '$score'},
+            'matches': {'$push': {'kind': '$kind', 'text': '$text', 'hit_count': '$hit_count', 'hits': '$hits'}},
+        }},
+        {'$sort': {'score': -1, '_id': 1}},
+        {'$skip': (page - 1) * limit},
+        {'$limit': limit + 1},
+        {'$project': {'score': 1, 'matches': {'$slice': ['$matches', 5]}}},
+        {'$lookup': {'from': 'videos', 'localField': '_id', 'foreignField': 'video_id', 'as': 'video'}},
+    ]
+    results = []
+    for row in search_collection.aggregate(pipeline):
+        video = row['video'][0] if row['video'] else {}
+        results.append({
+            'video_id': row['_id'],
+            'filename': video.get('filename'),
+            'status': video.get('status'),
+            'score': round(row['score'], 4),
+            'matches': row['matches'],
+        })
+    return results[:limit], len(results) > limit
+
+@app.route('/search', methods=['GET'])
+def search_route():
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'Arama terimi (q) gerekli'}), 400
+    kind = request.args.get('kind') or None
+    if kind and kind not in SEARCH_KIND_WEIGHTS:
+        return jsonify({'error': 'Geçersiz tür', 'kinds': list(SEARCH_KIND_WEIGHTS)}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), VIDEO_PAGE_MAX_SIZE))
+
+    try:
+        results, has_more = search_videos(query, kind, page, limit)
+    except Exception as e:
+        print(f"Arama hatası: {e}")
+        return jsonify({'error': 'Arama sırasında hata oluştu', 'details': str(e)}), 500
+    return jsonify({'query': query, 'page': page, 'results': results, 'has_more': has_more})
+
+def video_change_stream_loop():
+    """'videos' collection'ındaki ekleme/güncellemeleri change stream ile izleyip yayınlar."""
+    global _change_stream_active
+    pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]
+    resume_token = None
+    while True:
+        videos_collection = get_db_collection('videos')
+        if videos_collection is None:
+            time.sleep(SSE_HEARTBEAT_SECONDS)
+            continue
+        try:
+            with videos_collection.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as stream:
+                _change_stream_active = True
+                for change in stream:
+                    resume_token = stream.resume_token
+                    video = change.get('fullDocument')
+                    if video:
+                        video_events.publish(video_event_payload(video))
+        except Exception as e:
+            print(f"MongoDB change stream hatası, süreç içi yayına dönülüyor: {e}")
+            _change_stream_active = False
+            time.sleep(SSE_HEARTBEAT_SECONDS)
+
+def _sse_message(event):
+    return f"event: video\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+# WSGI üzerindeki /events bağlantıları thread tuttuğu için ayrıca sınırlanır
+_wsgi_sse_slots = threading.BoundedSemaphore(SSE_WSGI_MAX_CLIENTS)
+
+@app.route('/events', methods=['GET'])
+def video_events_stream():
+    """Video durum değişikliklerini Server-Sent Events olarak gönderir (SSE sunucusu kapalıyken).
+
+    Boşta bekleyen bir bağlantı da sunucunun bir thread'ini tutar; bu yüzden eşzamanlı bağlantı sayısı
+    SSE_WSGI_MAX_CLIENTS ile sınırlıdır. Sınır doluysa 503 döner ve sayfa periyodik sorgulamaya geçer.
+    """
+    if not _wsgi_sse_slots.acquire(blocking=False):
+        return jsonify({'error': 'Çok fazla canlı bağlantı var, daha sonra tekrar deneyin'}), 503
+    subscriber = video_events.subscribe()
+    if subscriber is None:
+        _wsgi_sse_slots.release()
+        return jsonify({'error': 'Çok fazla canlı bağlantı var, daha sonra tekrar deneyin'}), 503
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Proxy'lerin boşta bağlantıyı kapatmaması için yorum satırı
+                    yield ": ping\n\n"
+                    continue
+                yield _sse_message(event)
+        finally:
+            video_events.unsubscribe(subscriber)
+            _wsgi_sse_slots.release()
+
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+class _AsyncSubscriber:
+    """VideoEventBroker aboneliği: publish() hangi thread'den gelirse gelsin olayı asyncio kuyruğuna aktarır."""
+
+    def __init__(self, loop, maxsize=SSE_CLIENT_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put_nowait(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            # Yavaş istemci: en eski olayı at, yenisini ekle
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+class SseServer:
+    """Sadece GET /events sunan, tek thread'de çalışan asyncio HTTP sunucusu.
+
+    Her bağlantı bir coroutine'dir; binlerce boşta istemci WSGI thread'lerine dokunmaz.
+    """
+
+    def __init__(self, broker, host=SSE_HOST, port=SSE_PORT):
+        self.broker = broker
+        self.host = host
+        self.port = port
+        self.loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        threading.Thread(target=self._run, name='sse-server', daemon=True).start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._server.close)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_until_complete(self._server.serve_forever())
+
+    @staticmethod
+    async def _send_status(writer, status, message):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n"
+                     f"Connection: close\r\n\r\n".encode('ascii') + body)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        subscriber = None
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), SSE_HEARTBEAT_SECONDS)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                return
+            method, _, target = head.split(b'\r\n', 1)[0].decode('latin-1').partition(' ')
+            path = target.split(' ', 1)[0].split('?', 1)[0]
+            if path != '/events':
+                await self._send_status(writer, '404 Not Found', 'Bulunamadı')
+                return
+            if method != 'GET':
+                await self._send_status(writer, '405 Method Not Allowed', 'Sadece GET desteklenir')
+                return
+            subscriber = self.broker.subscribe(_AsyncSubscriber(self.loop))
+            if subscriber is None:
+                await self._send_status(writer, '503 Service Unavailable',
+                                        'Çok fazla canlı bağlantı var, daha sonra tekrar deneyin')
+                return
+            # Sayfa farklı bir porttan (origin) bağlandığı için CORS başlığı gerekir
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                         b"Cache-Control: no-cache\r\nX-Accel-Buffering: no\r\n"
+                         b"Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\nretry: 5000\n\n")
+            await writer.drain()
+            # İstemci bir şey göndermez; okuma tamamlanırsa bağlantı kapanmıştır
+            closed = asyncio.ensure_future(reader.read())
+            pending = None
+            try:
+                while True:
+                    if pending is None:
+                        pending = asyncio.ensure_future(subscriber.queue.get())
+                    done, _ = await asyncio.wait({pending, closed}, timeout=SSE_HEARTBEAT_SECONDS,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if closed in done:
+                        break
+                    if pending in done:
+                        writer.write(_sse_message(pending.result()).encode('utf-8'))
+                        pending = None
+                    else:
+                        # Proxy'lerin boşta bağlantıyı kapatmaması için yorum satırı
+                        writer.write(b": ping\n\n")
+                    await writer.drain()
+            finally:
+                closed.cancel()
+                if pending is not None:
+                    pending.cancel()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if subscriber is not None:
+                self.broker.unsubscribe(subscriber)
+            writer.close()
+
+sse_server = None
+
+def start_sse_server():
+    """SSE_PORT ayarlıysa asyncio SSE sunucusunu başlatır; port alınamazsa /events WSGI'de kalır."""
+    global sse_server
+    if not SSE_PORT or sse_server is not None:
+        return
+    try:
+        sse_server = SseServer(video_events).start()
+        print(f"SSE sunucusu {SSE_HOST}:{sse_server.port} üzerinde başlatıldı.")
+    except OSError as e:
+        print(f"SSE sunucusu başlatılamadı, olaylar WSGI /events üzerinden verilecek: {e}")
+
+def video_events_url():
+    """Tarayıcının EventSource ile bağlanacağı adres."""
+    if sse_server is None:
+        return url_for('video_events_stream')
+    if SSE_PUBLIC_URL:
+        return SSE_PUBLIC_URL
+    return f"{request.scheme}://{request.host.rsplit(':', 1)[0]}:{sse_server.port}/events"
+
+# Sunucu modülü import ettiğinde (ör. waitress-serve app:app) işçiler ilk isteği beklemeden başlar
+if _should_start_background_workers():
+    start_background_workers()
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Index ayrıştırma benchmark'ı: eski yöntem (tüm JSON'u dict'e yüklemek) ile akış tabanlı
+ayıklayıcının (app.parse_index_file) bellek ve süre karşılaştırması. Süre tracemalloc kapalıyken
+ölçülür (duvar saati); wall_time_ratio akış tabanlı sürenin json.loads'a oranıdır.
+
+    python benchmarks/bench_extractor.py --transcript-lines 200000 --labels 5000
+
+Sonuç stdout'a JSON olarak yazılır; --output ile dosyaya da kaydedilebilir.
+"""
+import argparse
+import gc
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sadece ayrıştırma ölçülür; yükleme işçileri ve sorgulayıcı başlatılmasın
+os.environ.setdefault('BACKGROUND_WORKERS_ENABLED', '0')
+
+import app  # noqa: E402
+from stub_indexer import make_index_document  # noqa: E402
+
+
+def write_synthetic_index(path, args):
+    document = make_index_document(
+        'bench', keywords=args.keywords, topics=args.topics, labels=args.labels,
+        transcript_lines=args.transcript_lines, instances_per_item=args.instances_per_item,
+        duration_seconds=args.duration_seconds)
+    with gzip.open(path, 'wt', encoding='utf-8') as index_file:
+        json.dump(document, index_file)
+    return os.path.getsize(path)
+
+
+def measure(func, repeat):
+    """(sonuç, duvar saati süresi, tepe bellek) döndürür.
+
+    tracemalloc her bellek ayırmayı izlediği için süreyi şişirir; süre izleme kapalıyken ayrı çalıştırmalarda
+    (en iyisi) ölçülür, tepe bellek ise tek bir izlenen çalıştırmada.
+    """
+    elapsed = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(elapsed), peak
+
+
+def parse_whole_document(path):
+    """Eski get_result() davranışı: yanıt gövdesi + tam dict bellekte, sonra sadece anahtar kelime/konu."""
+    with gzip.open(path, 'rb') as index_file:
+        body = index_file.read()
+    analysis_data = json.loads(body)
+    insights = analysis_data.get('videos', [{}])[0].get('insights', {})
+    keywords = [keyword.get('text', '-') for keyword in insights.get('keywords', [])]
+    topics = [topic.get('name', '-') for topic in insights.get('topics', [])]
+    return len(keywords) + len(topics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keywords', type=int, default=5000)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--labels', type=int, default=5000)
+    parser.add_argument('--transcript-lines', type=int, default=100000)
+    parser.add_argument('--instances-per-item', type=int, default=5)
+    parser.add_argument('--duration-seconds', type=int, default=4 * 3600)
+    parser.add_argument('--repeat', type=int, default=3, help='Süre ölçümü için tekrar sayısı (en iyisi raporlanır)')
+    parser.add_argument('--output', help='Sonucun yazılacağı JSON dosyası')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.json.gz')
+        compressed_size = write_synthetic_index(path, args)
+        with gzip.open(path, 'rb') as index_file:
+            raw_size = sum(len(block) for block in iter(lambda: index_file.read(1 << 20), b''))
+
+        baseline_items, baseline_seconds, baseline_peak = measure(lambda: parse_whole_document(path), args.repeat)
+        extraction, streaming_seconds, streaming_peak = measure(lambda: app.parse_index_file(path), args.repeat)
+        timeline_document = extraction.timeline.to_document()
+        timeline_bytes = sum(len(timeline_document[column]) for column in ('kind', 'text', 'confidence', 'start', 'end'))
+        timeline_bytes += sum(len(text.encode('utf-8')) for text in timeline_document['strings'])
+
+    report = {
+        'benchmark': 'index_extractor',
+        'ijson_backend': getattr(app.ijson, 'backend', None) if app.ijson is not None else None,
+        'index_bytes': raw_size,
+        'index_gzip_bytes': compressed_size,
+        'baseline': {'seconds': round(baseline_seconds, 3), 'peak_bytes': baseline_peak,
+                     'items_extracted': baseline_items},
+        'streaming': {'seconds': round(streaming_seconds, 3), 'peak_bytes': streaming_peak,
+                      'instances_extracted': len(extraction.timeline), 'timeline_bytes': timeline_bytes},
+        'peak_memory_ratio': round(baseline_peak / max(streaming_peak, 1), 1),
+        'wall_time_ratio': round(streaming_seconds / max(baseline_seconds, 1e-9), 2),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
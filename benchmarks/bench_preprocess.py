@@ -0,0 +1,209 @@
+"""Ön işleme benchmark'ı: videoları olduğu gibi göndermek ile analiz profiline indirip göndermek.
+
+    python benchmarks/bench_preprocess.py klip1.mp4 klip2.mov --uplink-mbps 20
+    python benchmarks/bench_preprocess.py --generate --duration 20
+
+--generate ile ffmpeg'in test kaynağından örnek klipler (4K/60, 1080p/30, 480p/30) üretilir.
+Klipler uygulamadaki gibi yükleme işi olarak kuyruğa alınır ve arka plan işçileri tarafından işlenir:
+önce ön işleme kapalıyken (doğrudan yükleme), sonra açıkken (PREPROCESS_WORKERS kadar eşzamanlı ön
+işleme + UPLOAD_WORKER_COUNT yükleme işçisi). Yüklemeler yerel stub Video Indexer'a (stub_indexer.py)
+yapılır; localhost bant genişliği gerçekçi olmadığı için uçtan uca süre, ölçülen ön işleme süresi +
+--uplink-mbps ile modellenen aktarım süresi olarak da raporlanır. --mongo-uri verilmezse mongomock
+kullanılır (thread güvenli değildir; sonuçlar için yerel bir mongod önerilir). Sonuç stdout'a JSON olarak yazılır; --output ile dosyaya da kaydedilebilir.
+ffmpeg ve ffprobe PATH'te (veya FFMPEG_PATH / FFPROBE_PATH ile verilmiş) olmalıdır.
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_indexer import StubIndexerServer  # noqa: E402
+
+SAMPLE_PROFILES = [
+    ('sample-2160p60', 3840, 2160, 60),
+    ('sample-1080p30', 1920, 1080, 30),
+    ('sample-480p30', 854, 480, 30),
+]
+
+
+def generate_samples(directory, duration, ffmpeg):
+    """ffmpeg testsrc2 + sinüs sesiyle, telefon kaydına benzer yüksek bit hızlı klipler üretir."""
+    paths = []
+    for name, width, height, fps in SAMPLE_PROFILES:
+        path = os.path.join(directory, f'{name}.mp4')
+        # Telefonlar yaklaşık 0.2 bit/piksel/kare ile kaydeder
+        bitrate = int(width * height * fps * 0.2)
+        subprocess.run([
+            ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={fps}:duration={duration}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', str(bitrate),
+            '-c:a', 'aac', '-b:a', '192k', '-shortest', path,
+        ], check=True)
+        paths.append(path)
+    return paths
+
+
+def modeled_transfer_seconds(size, uplink_mbps):
+    return size * 8 / (uplink_mbps * 1_000_000)
+
+
+def run_jobs(app, clips, label):
+    """Kliplerin kopyalarını yükleme işi olarak kuyruğa alır, hepsi bitene kadar bekler.
+
+    (duvar saati süresi, iş dokümanları) döndürür. Tamamlanan işlerin spool dosyaları silindiği için kopya kullanılır.
+    """
+    jobs_collection = app.get_db_collection('upload_jobs')
+    job_ids = []
+    started = time.perf_counter()
+    for i, clip in enumerate(clips):
+        spool_path = os.path.join(app.UPLOAD_SPOOL_DIR, f'{label}-{i}-{uuid.uuid4().hex}')
+        shutil.copyfile(clip, spool_path)
+        job = app.enqueue_upload_job(spool_path, os.path.basename(clip), 'video/mp4')
+        job_ids.append(job['_id'])
+    finished = {app.JOB_STATUS_DONE, app.JOB_STATUS_FAILED}
+    while True:
+        jobs = {job['_id']: job for job in jobs_collection.find({'_id': {'$in': job_ids}})}
+        if all(job['status'] in finished for job in jobs.values()):
+            break
+        time.sleep(0.2)
+    wall_seconds = time.perf_counter() - started
+    failed = [job for job in jobs.values() if job['status'] == app.JOB_STATUS_FAILED]
+    if failed:
+        raise RuntimeError(f"{len(failed)} iş başarısız oldu: {failed[0].get('last_error')}")
+    return wall_seconds, [jobs[job_id] for job_id in job_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ön işleme (ffmpeg) benchmark\'ı')
+    parser.add_argument('clips', nargs='*', help='Ölçülecek video dosyaları')
+    parser.add_argument('--generate', action='store_true', help='Örnek klipleri ffmpeg ile üret')
+    parser.add_argument('--duration', type=int, default=10, help='Üretilen kliplerin süresi (sn)')
+    parser.add_argument('--uplink-mbps', type=float, default=20.0, help='Modellenen yükleme bant genişliği')
+    parser.add_argument('--max-height', type=int, default=720)
+    parser.add_argument('--max-fps', type=float, default=30)
+    parser.add_argument('--video-bitrate', type=int, default=1500000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='PREPROCESS_WORKERS')
+    parser.add_argument('--upload-workers', type=int, default=2, help='UPLOAD_WORKER_COUNT')
+    parser.add_argument('--mongo-uri', help='Yerel mongod adresi; verilmezse mongomock kullanılır')
+    parser.add_argument('--output', help='Sonucu bu dosyaya da yaz')
+    args = parser.parse_args()
+
+    ffmpeg = os.getenv('FFMPEG_PATH', 'ffmpeg')
+    if shutil.which(ffmpeg) is None:
+        parser.error('ffmpeg bulunamadı (PATH veya FFMPEG_PATH)')
+
+    mongomock = None
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            parser.error('--mongo-uri verin veya bellek içi çalıştırma için mongomock kurun')
+        print('Uyarı: mongomock thread güvenli değil; işçilerin sorguları hata verebilir.', file=sys.stderr)
+
+    stub = StubIndexerServer(processing_seconds=3600).start()
+    work_dir = tempfile.mkdtemp(prefix='bench-preprocess-')
+    os.environ.update({
+        'VIDEO_INDEXER_API_URL': stub.url, 'VIDEO_INDEXER_LOCATION': 'trial',
+        'VIDEO_INDEXER_ACCOUNT_ID': 'stub', 'VIDEO_INDEXER_SUBSCRIPTION_KEY': 'stub',
+        'PREPROCESS_MAX_HEIGHT': str(args.max_height), 'PREPROCESS_MAX_FPS': str(args.max_fps),
+        'PREPROCESS_VIDEO_BITRATE': str(args.video_bitrate), 'PREPROCESS_WORKERS': str(args.workers),
+        'PREPROCESS_ENABLED': '1', 'UPLOAD_WORKER_COUNT': str(args.upload_workers),
+        'MONGODB_CONNECTION_STRING': args.mongo_uri or 'mongodb://mongomock',
+        'MONGODB_DB_NAME': f'bench_preprocess_{uuid.uuid4().hex[:8]}',
+        'UPLOAD_SPOOL_DIR': os.path.join(work_dir, 'spool'), 'INDEX_POLL_ENABLED': '0', 'SSE_PORT': '0',
+        # İşçiler MongoClient mongomock ile değiştirildikten sonra başlatılır
+        'BACKGROUND_WORKERS_ENABLED': '0',
+    })
+    import app  # noqa: E402  (ayarlar ortam değişkenlerinden import sırasında okunur)
+    if mongomock is not None:
+        app.MongoClient = mongomock.MongoClient
+    with contextlib.redirect_stdout(sys.stderr):
+        app.start_background_workers()
+
+    try:
+        clips = list(args.clips)
+        if args.generate:
+            clips += generate_samples(work_dir, args.duration, ffmpeg)
+        if not clips:
+            parser.error('en az bir klip verin veya --generate kullanın')
+
+        # Aynı klipler önce doğrudan, sonra ön işleme aşamasından geçerek yüklenir. Tüm işler aynı anda
+        # kuyruğa alındığı için toplam süre ön işleme ve yükleme aşamalarının paralelliğini de gösterir.
+        with contextlib.redirect_stdout(sys.stderr):
+            app.PREPROCESS_ENABLED = False
+            baseline_wall_seconds, baseline_jobs = run_jobs(app, clips, 'original')
+            app.PREPROCESS_ENABLED = True
+            pipeline_wall_seconds, jobs = run_jobs(app, clips, 'preprocessed')
+        # İlk işin kuyruğa girişinden son işin yükleme aşamasına alınmasına kadar
+        preprocess_wall_seconds = (max(job['started_at'] for job in jobs)
+                                   - min(job['created_at'] for job in jobs)).total_seconds()
+
+        rows = []
+        for clip, baseline_job, job in zip(clips, baseline_jobs, jobs):
+            result, stats = job['preprocess'], job['upload_stats']
+            if result.get('error'):
+                raise RuntimeError(f"{clip} ön işlenemedi: {result['error']}")
+            rows.append({
+                'clip': os.path.basename(clip),
+                'original_height': result['original_height'],
+                'original_fps': result['original_fps'],
+                'transcoded': result['transcoded'],
+                'original_bytes': result['original_size'],
+                'sent_bytes': result['sent_size'],
+                'saved_percent': round(100 * (1 - result['sent_size'] / result['original_size']), 1),
+                'preprocess_seconds': result['preprocess_seconds'],
+                'upload_seconds_local': {'original': baseline_job['upload_stats']['upload_seconds'],
+                                         'sent': stats['upload_seconds']},
+                'end_to_end_seconds_modeled': {
+                    'original': round(modeled_transfer_seconds(result['original_size'], args.uplink_mbps), 2),
+                    'preprocessed': round(result['preprocess_seconds']
+                                          + modeled_transfer_seconds(result['sent_size'], args.uplink_mbps), 2),
+                },
+            })
+
+        original_total = sum(row['original_bytes'] for row in rows)
+        sent_total = sum(row['sent_bytes'] for row in rows)
+        report = {
+            'profile': {'max_height': args.max_height, 'max_fps': args.max_fps, 'video_bitrate': args.video_bitrate},
+            'workers': args.workers,
+            'upload_workers': args.upload_workers,
+            'mongo': 'mongod' if args.mongo_uri else f'mongomock {mongomock.__version__}',
+            'uplink_mbps': args.uplink_mbps,
+            'clips': rows,
+            'total': {
+                'original_bytes': original_total,
+                'sent_bytes': sent_total,
+                'saved_percent': round(100 * (1 - sent_total / original_total), 1),
+                'preprocess_wall_seconds': round(preprocess_wall_seconds, 2),
+                'job_wall_seconds_local': {'original': round(baseline_wall_seconds, 2),
+                                           'preprocessed': round(pipeline_wall_seconds, 2)},
+                'end_to_end_seconds_modeled': {
+                    'original': round(modeled_transfer_seconds(original_total, args.uplink_mbps), 2),
+                    'preprocessed': round(preprocess_wall_seconds
+                                          + modeled_transfer_seconds(sent_total, args.uplink_mbps), 2),
+                },
+            },
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        stub.stop()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report_file:
+            report_file.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""Çevrimdışı yük testi: stub Video Indexer + yerel/bellek içi MongoDB ile gerçek Flask uygulaması.
+
+    python benchmarks/load_test.py --sizes 1000,100000 --requests 500 --concurrency 16 --output run.json
+    python benchmarks/load_test.py --mongo-uri mongodb://127.0.0.1:27017 --sizes 1000,100000,1000000
+    python benchmarks/load_test.py --compare onceki.json --output sonraki.json
+
+Her koleksiyon boyutu için 'videos' (ve işlenmiş videoların 'results' ve 'search_terms' kayıtları)
+tohumlanır, ardından /upload, /result/<video_id>, / ve /search uç noktalarına eşzamanlı istek gönderilir. Uçlar Flask test_client ile
+sürülür (ağ yığını ölçüme girmez). Azure çağrıları stub_indexer.py'ye gider.
+
+--mongo-uri verilmezse mongomock (kuruluysa) kullanılır. mongomock sorguları indekssiz, Python içinde
+çalıştırır, benzersiz indeks kontrolü her eklemede tüm koleksiyonu tarar ve thread güvenli değildir; bu
+yüzden onunla varsayılan boyut yalnızca 1000'dir, istekler tek thread ile gönderilir ve arka plan yükleme
+işçileri kapalıdır (eşzamanlı okumalar bile mongomock'ta hata verir, ana sayfa bunu boş liste olarak
+yutar ve ölçüm yanıltıcı olur). mongomock $text desteklemediği için /search sadece mongod ile ölçülür;
+aranan terimler Zipf benzeri dağılımdan seçilir, en sık terim videoların çoğunda geçer. Eşzamanlılık, 100k ve 1M
+ölçümleri için gerçek bir mongod kullanın. Bellek her aşama (tohumlama, uç nokta ölçümü) boyunca
+/proc/self/statm'den örneklenen anlık RSS'tir: aşama başındaki değer, aşama içindeki tepe ve farkı
+raporlanır (mongomock ile bellek içi veritabanını da kapsar). Uygulamanın print() çıktıları stderr'e yönlendirilir.
+
+Sonuç JSON olarak yazılır; --compare ile önceki bir çalıştırmaya göre p95 ve throughput farkları
+raporlanır, --threshold yüzdesini aşan gerilemelerde çıkış kodu 1 olur.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_indexer import StubIndexerServer  # noqa: E402
+
+ENDPOINTS = ('/upload', '/result/<video_id>', '/', '/search')
+# mongomock $text aramasını desteklemez
+MONGOD_ONLY_ENDPOINTS = ('/search',)
+SEARCH_VOCABULARY_SIZE = 2000
+SEARCH_TERMS_PER_VIDEO = 25
+SEED_BATCH_SIZE = 10000
+RSS_SAMPLE_SECONDS = 0.05
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+STATUSES = ['Uploaded', 'Processing', 'Processed', 'Failed']
+
+
+def percentile(sorted_values, fraction):
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def current_rss_bytes():
+    """Sürecin anlık RSS'i; /proc yoksa (ör. macOS) sadece artabilen ru_maxrss'e düşer."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux KB, macOS bayt döndürür
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RssSampler:
+    """with bloğu boyunca anlık RSS'i periyodik örnekler; başlangıç, tepe ve farkı MB olarak raporlar.
+
+    ru_maxrss süreç ömrü boyunca sadece artar, sonraki aşamalar öncekilerin tepesini gösterirdi.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        self.peak = max(self.peak, current_rss_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start = self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    def report(self):
+        mb = 1024 * 1024
+        return {'rss_start_mb': round(self.start / mb, 1), 'rss_peak_mb': round(self.peak / mb, 1),
+                'rss_delta_mb': round((self.peak - self.start) / mb, 1)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Seeder:
+    """'videos' ve 'results' koleksiyonlarını istenen boyuta kadar artımlı olarak doldurur."""
+
+    def __init__(self, app, result_miss_rate, rng, seed_search_terms=False):
+        self.app = app
+        self.result_miss_rate = result_miss_rate
+        self.rng = rng
+        self.seed_search_terms = seed_search_terms
+        # Zipf benzeri ağırlıklar: az sayıda terim çok videoda, çoğu terim az videoda geçer
+        self.vocabulary = [f'term{k}' for k in range(SEARCH_VOCABULARY_SIZE)]
+        self.vocabulary_weights = [1.0 / (k + 1) for k in range(SEARCH_VOCABULARY_SIZE)]
+        self.count = 0
+        # /result için örneklenen video_id'ler (sonucu kayıtlı olanlar ve olmayanlar)
+        self.processed_ids = []
+        self.missing_ids = []
+        self._base_date = datetime.datetime.utcnow() - datetime.timedelta(days=365)
+
+    def seed_to(self, size):
+        videos = self.app.get_db_collection('videos')
+        results = self.app.get_db_collection('results')
+        search_terms = self.app.get_db_collection('search_terms')
+        empty_timeline = self.app.InsightTimeline().to_document()
+        while self.count < size:
+            batch_videos, batch_results, batch_terms = [], [], []
+            for i in range(self.count, min(size, self.count + SEED_BATCH_SIZE)):
+                video_id = f'seed{i:07d}'
+                status = STATUSES[i % len(STATUSES)]
+                batch_videos.append({
+                    'video_id': video_id,
+                    'filename': f'video-{i:07d}.mp4',
+                    'upload_date': self._base_date + datetime.timedelta(seconds=i),
+                    'status': status,
+                    'processing_progress': '100%' if status == 'Processed' else '50%',
+                })
+                if status != 'Processed':
+                    continue
+                if self.rng.random() < self.result_miss_rate:
+                    # Sonucu kayıtlı değil: /result isteği stub'dan indirip ayrıştırır
+                    self.missing_ids.append(video_id)
+                    continue
+                self.processed_ids.append(video_id)
+                batch_results.append({
+                    'video_id': video_id, 'state': 'Processed',
+                    'keywords': [f'keyword{k}' for k in range(20)], 'topics': [f'topic{k}' for k in range(5)],
+                    'timeline': empty_timeline, 'raw_index_file_id': None, 'has_index': False,
+                    'updated_at': datetime.datetime.utcnow(),
+                })
+                if self.seed_search_terms:
+                    batch_terms.extend(self.app.build_search_documents(video_id, self.search_instances()))
+            videos.insert_many(batch_videos, ordered=False)
+            if batch_results:
+                results.insert_many(batch_results, ordered=False)
+            if batch_terms:
+                search_terms.insert_many(batch_terms, ordered=False)
+            self.count += len(batch_videos)
+
+    def search_instances(self):
+        """Bir video için (tür, metin, güven, başlangıç, bitiş) örnekleri; terimler tekrarlanabilir."""
+        words = self.rng.choices(self.vocabulary, self.vocabulary_weights, k=SEARCH_TERMS_PER_VIDEO)
+        kinds = ('keyword', 'topic', 'label', 'transcript')
+        return [(kinds[i % len(kinds)], word, self.rng.random(), float(i * 10), float(i * 10 + 5))
+                for i, word in enumerate(words)]
+
+    def search_query(self, rng):
+        return rng.choices(self.vocabulary, self.vocabulary_weights)[0]
+
+    def result_id(self, rng):
+        if self.missing_ids and (not self.processed_ids or rng.random() < self.result_miss_rate):
+            # Aynı video ikinci kez istendiğinde artık kayıtlıdır; listeden çıkar
+            try:
+                return self.missing_ids.pop()
+            except IndexError:
+                pass
+        return rng.choice(self.processed_ids)
+
+
+def run_endpoint(app, name, make_request, requests_count, concurrency):
+    """make_request(client, i) çağrılarını eşzamanlı yürütür; gecikme istatistiklerini döndürür."""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.app.test_client()
+        started = time.perf_counter()
+        try:
+            status = make_request(client, i)
+        except Exception as e:  # benchmark devam etsin, hata sayılsın
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        'endpoint': name,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'throughput_rps': round(requests_count / wall, 1) if wall else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'errors': errors,
+        'status_counts': statuses,
+    }
+
+
+def compare_reports(previous, current, threshold):
+    """(satırlar, gerileme_var_mı) döndürür. p95 artışı veya throughput düşüşü threshold'u aşarsa gerileme."""
+    old = {(row['size'], row['endpoint']): row for row in previous.get('results', [])}
+    rows, regressed = [], False
+    for row in current['results']:
+        before = old.get((row['size'], row['endpoint']))
+        if before is None:
+            continue
+        p95_change = 100 * (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        rps_change = (100 * (row['throughput_rps'] - before['throughput_rps']) / before['throughput_rps']
+                      if before['throughput_rps'] else 0.0)
+        is_regression = p95_change > threshold or rps_change < -threshold
+        regressed = regressed or is_regression
+        rows.append({
+            'size': row['size'], 'endpoint': row['endpoint'],
+            'p95_ms': [before['p95_ms'], row['p95_ms']], 'p95_change_percent': round(p95_change, 1),
+            'throughput_rps': [before['throughput_rps'], row['throughput_rps']],
+            'throughput_change_percent': round(rps_change, 1),
+            'regression': is_regression,
+        })
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Çevrimdışı yük testi')
+    parser.add_argument('--sizes', help='Virgülle ayrılmış video koleksiyonu boyutları '
+                                        '(varsayılan: mongod ile 1000,100000,1000000; mongomock ile 1000)')
+    parser.add_argument('--requests', type=int, default=300, help='Uç nokta başına istek sayısı')
+    parser.add_argument('--concurrency', type=int, help='Eşzamanlı istek sayısı (varsayılan: mongod ile 8, mongomock ile 1)')
+    parser.add_argument('--endpoints', help='Virgülle ayrılmış uç noktalar (varsayılan: hepsi; mongomock ile /search hariç)')
+    parser.add_argument('--mongo-uri', help='Yerel mongod adresi; verilmezse mongomock kullanılır')
+    parser.add_argument('--upload-bytes', type=int, default=1024 * 1024, help='/upload gövde boyutu')
+    parser.add_argument('--upload-workers', type=int,
+                        help='Arka plan yükleme işçisi sayısı (varsayılan: mongod ile 2, mongomock ile 0)')
+    parser.add_argument('--result-miss-rate', type=float, default=0.05,
+                        help="/result isteklerinden kayıtlı sonucu olmayanların (stub'dan çekilen) oranı")
+    parser.add_argument('--stub-latency-ms', type=int, default=20)
+    parser.add_argument('--stub-transcript-lines', type=int, default=100)
+    parser.add_argument('--stub-labels', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Sonucu bu dosyaya yaz')
+    parser.add_argument('--compare', help='Karşılaştırılacak önceki sonuç dosyası')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Gerileme eşiği (yüzde)')
+    args = parser.parse_args()
+
+    if args.sizes is None:
+        args.sizes = '1000,100000,1000000' if args.mongo_uri else '1000'
+    if args.upload_workers is None:
+        args.upload_workers = 2 if args.mongo_uri else 0
+    if args.concurrency is None:
+        args.concurrency = 8 if args.mongo_uri else 1
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    if args.endpoints is None:
+        args.endpoints = ','.join(endpoint for endpoint in ENDPOINTS
+                                  if args.mongo_uri or endpoint not in MONGOD_ONLY_ENDPOINTS)
+    endpoints = [endpoint for endpoint in args.endpoints.split(',') if endpoint]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'bilinmeyen uç nokta: {", ".join(sorted(unknown))}')
+    if not args.mongo_uri and set(endpoints) & set(MONGOD_ONLY_ENDPOINTS):
+        parser.error(f'{", ".join(MONGOD_ONLY_ENDPOINTS)} için --mongo-uri gerekli (mongomock $text desteklemez)')
+
+    mongomock = None
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            parser.error('--mongo-uri verin veya bellek içi çalıştırma için mongomock kurun')
+        if args.concurrency > 1 or args.upload_workers > 0:
+            print('Uyarı: mongomock thread güvenli değil; eşzamanlı isteklerde sorgular hata verebilir.',
+                  file=sys.stderr)
+        if sizes[-1] > 10000:
+            print('Uyarı: mongomock ile tohumlama boyutla karesel yavaşlar ve sorgular indeks kullanmaz; '
+                  'büyük boyutlar için --mongo-uri verin.', file=sys.stderr)
+
+    stub = StubIndexerServer(
+        latency_ms=args.stub_latency_ms, processing_seconds=0,
+        index_options={'transcript_lines': args.stub_transcript_lines, 'labels': args.stub_labels},
+    ).start()
+    spool_dir = tempfile.mkdtemp(prefix='load-test-spool-')
+    db_name = f'load_test_{uuid.uuid4().hex[:8]}'
+    os.environ.update({
+        'VIDEO_INDEXER_API_URL': stub.url, 'VIDEO_INDEXER_LOCATION': 'trial',
+        'VIDEO_INDEXER_ACCOUNT_ID': 'stub', 'VIDEO_INDEXER_SUBSCRIPTION_KEY': 'stub',
+        'MONGODB_CONNECTION_STRING': args.mongo_uri or 'mongodb://mongomock', 'MONGODB_DB_NAME': db_name,
+        'UPLOAD_SPOOL_DIR': spool_dir, 'UPLOAD_WORKER_COUNT': str(args.upload_workers),
+        # Sorgulayıcı ölçülen isteklerle yarışmasın; /result zaten eksik sonuçları kendisi çeker
+        'INDEX_POLL_ENABLED': '0',
+        # İşçiler MongoClient mongomock ile değiştirildikten sonra başlatılır
+        'BACKGROUND_WORKERS_ENABLED': '0',
+    })
+    import app  # noqa: E402  (ayarlar ortam değişkenlerinden import sırasında okunur)
+    if mongomock is not None:
+        app.MongoClient = mongomock.MongoClient
+    with contextlib.redirect_stdout(sys.stderr):
+        app.start_background_workers()
+    app.app.logger.disabled = True
+
+    rng = random.Random(args.seed)
+    seeder = Seeder(app, args.result_miss_rate, rng, seed_search_terms='/search' in endpoints)
+    upload_body = os.urandom(args.upload_bytes)
+
+    def upload_request(client, i):
+        # Her yüklemenin içeriği farklı olsun; aksi halde tekilleştirme Azure yüklemesini atlar
+        body = upload_body[:-16] + uuid.uuid4().bytes
+        response = client.post('/upload', data={'video': (io.BytesIO(body), f'load-{i}.mp4', 'video/mp4')},
+                               content_type='multipart/form-data')
+        return response.status_code
+
+    def result_request(client, i):
+        return client.get(f'/result/{seeder.result_id(rng)}').status_code
+
+    def home_request(client, i):
+        return client.get('/').status_code
+
+    def search_request(client, i):
+        return client.get('/search', query_string={'q': seeder.search_query(rng)}).status_code
+
+    requests_by_endpoint = {'/upload': upload_request, '/result/<video_id>': result_request, '/': home_request,
+                            '/search': search_request}
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mongo': 'mongod' if args.mongo_uri else f'mongomock {mongomock.__version__}',
+            'started_at': datetime.datetime.utcnow().isoformat() + 'Z',
+            'args': vars(args),
+        },
+        'results': [],
+        'seeding': [],
+    }
+    try:
+        # İlk istek MongoDB bağlantısını kurar ve indeksleri oluşturur
+        with contextlib.redirect_stdout(sys.stderr):
+            app.app.test_client().get('/token/stats')
+        for size in sizes:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stderr), RssSampler() as rss:
+                seeder.seed_to(size)
+            report['seeding'].append(dict({'size': size, 'seconds': round(time.perf_counter() - started, 2)},
+                                          **rss.report()))
+            print(f'{size} video tohumlandı.', file=sys.stderr)
+            for endpoint in endpoints:
+                with contextlib.redirect_stdout(sys.stderr), RssSampler() as rss:
+                    row = run_endpoint(app, endpoint, requests_by_endpoint[endpoint], args.requests, args.concurrency)
+                row.update(size=size, **rss.report())
+                report['results'].append(row)
+                print(f"  {endpoint}: {row['throughput_rps']} istek/sn, p95 {row['p95_ms']} ms", file=sys.stderr)
+    finally:
+        stub.stop()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        if args.mongo_uri:
+            client = app.get_mongo_client()
+            if client is not None:
+                client.drop_database(db_name)
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous_file:
+            report['comparison'], regressed = compare_reports(json.load(previous_file), report, args.threshold)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report_file:
+            report_file.write(output + '\n')
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
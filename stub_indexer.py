@@ -0,0 +1,274 @@
+"""Azure Video Indexer API'sinin yerel, çevrimdışı bir taklidi (stub).
+
+Uygulamanın kullandığı uç noktaları taklit eder:
+
+    GET  /Auth/<location>/Accounts/<account>/AccessToken
+    POST /<location>/Accounts/<account>/Videos
+    GET  /<location>/Accounts/<account>/Videos/<video_id>/Index
+    GET  /stub/stats                     (sadece stub: sayaçlar)
+
+Gecikme, indeksleme süresi, 429 ve 5xx oranları ve Index dokümanının boyutu ayarlanabilir.
+Uygulamayı stub'a yönlendirmek için:
+
+    python stub_indexer.py --port 8081 --throttle-rate 0.2
+    VIDEO_INDEXER_API_URL=http://127.0.0.1:8081 VIDEO_INDEXER_LOCATION=trial \\
+        VIDEO_INDEXER_ACCOUNT_ID=stub VIDEO_INDEXER_SUBSCRIPTION_KEY=stub python app.py
+
+MongoDB devre kesicisini denemek için uygulamayı erişilemeyen bir adresle başlatmak yeterli
+(ör. MONGODB_CONNECTION_STRING=mongodb://127.0.0.1:1): ilk istek MONGO_SERVER_SELECTION_TIMEOUT_MS
+(varsayılan 5 sn) bekler, sonrakiler MONGO_BREAKER_RESET_SECONDS dolana kadar hemen 500 döner.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+AUTH_PATH = re.compile(r'^/Auth/[^/]+/Accounts/[^/]+/AccessToken$')
+UPLOAD_PATH = re.compile(r'^/[^/]+/Accounts/[^/]+/Videos$')
+INDEX_PATH = re.compile(r'^/[^/]+/Accounts/[^/]+/Videos/([^/]+)/Index$')
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def _format_time(seconds):
+    """Saniyeyi Azure'un kullandığı 'H:MM:SS.fff' biçimine çevirir."""
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours)}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def make_index_document(video_id, state='Processed', progress='100%', keywords=20, topics=5,
+                        labels=20, transcript_lines=100, instances_per_item=3, duration_seconds=600):
+    """Gerçek Index yanıtının şeklinde sentetik bir doküman üretir."""
+    rng = random.Random(video_id)
+
+    def instances():
+        result = []
+        for _ in range(instances_per_item):
+            start = rng.uniform(0, duration_seconds - 5)
+            result.append({'start': _format_time(start), 'end': _format_time(start + rng.uniform(1, 5))})
+        return result
+
+    insights = {}
+    if state == 'Processed':
+        insights = {
+            'keywords': [{'id': i, 'text': f'keyword{i}', 'confidence': round(rng.random(), 3),
+                          'language': 'tr-TR', 'instances': instances()} for i in range(keywords)],
+            'topics': [{'id': i, 'name': f'topic{i}', 'confidence': round(rng.random(), 3),
+                        'instances': instances()} for i in range(topics)],
+            'labels': [{'id': i, 'name': f'label{i}', 'language': 'en-US',
+                        'instances': [dict(instance, confidence=round(rng.random(), 3)) for instance in instances()]}
+                       for i in range(labels)],
+            'transcript': [{'id': i, 'text': f'transcript line {i} keyword{i % max(keywords, 1)}',
+                            'confidence': round(rng.random(), 3), 'speakerId': 1, 'language': 'tr-TR',
+                            'instances': [{'start': _format_time(i * 3), 'end': _format_time(i * 3 + 3)}]}
+                           for i in range(transcript_lines)],
+        }
+    return {
+        'accountId': 'stub',
+        'id': video_id,
+        'name': f'{video_id}.mp4',
+        'state': state,
+        'durationInSeconds': duration_seconds,
+        'videos': [{
+            'id': video_id,
+            'state': state,
+            'processingProgress': progress,
+            'insights': insights,
+        }],
+        'summarizedInsights': {},
+    }
+
+
+class StubIndexerState:
+    """Stub sunucunun ayarları, yüklenen videolar ve sayaçlar."""
+
+    def __init__(self, latency_ms=0, processing_seconds=5, throttle_rate=0.0, retry_after=1,
+                 error_rate=0.0, error_status=503, index_options=None):
+        self.latency_ms = latency_ms
+        self.processing_seconds = processing_seconds
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.index_options = index_options or {}
+        self.videos = {}
+        self.lock = threading.Lock()
+        self.counters = {'auth': 0, 'upload': 0, 'index': 0, 'throttled': 0, 'errors': 0, 'uploaded_bytes': 0}
+        self._index_cache = {}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def index_body(self, video_id):
+        """Index yanıtını (bayt) döndürür; işlenmiş videolar için önbelleklenir."""
+        created = self.videos.get(video_id)
+        elapsed = time.time() - created if created is not None else self.processing_seconds
+        if elapsed < self.processing_seconds:
+            progress = f"{int(elapsed * 100 / self.processing_seconds)}%"
+            return json.dumps(make_index_document(video_id, state='Processing', progress=progress,
+                                                  **self.index_options)).encode('utf-8')
+        body = self._index_cache.get(video_id)
+        if body is None:
+            body = json.dumps(make_index_document(video_id, **self.index_options)).encode('utf-8')
+            self._index_cache[video_id] = body
+        return body
+
+
+class StubIndexerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'StubVideoIndexer/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.stub_state
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode('utf-8'), headers=headers)
+
+    def _drain_body(self):
+        remaining = int(self.headers.get('Content-Length') or 0)
+        total = 0
+        while remaining > 0:
+            block = self.rfile.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            total += len(block)
+        return total
+
+    def _throttled(self):
+        """İsteği 429 veya sunucu hatasıyla (ayarlanan oranlarda) reddeder; reddettiyse True."""
+        if self.state.throttle_rate and random.random() < self.state.throttle_rate:
+            self.state.count('throttled')
+            self._send_json(429, {'ErrorType': 'USER_NOT_ALLOWED', 'Message': 'Too many requests'},
+                            headers={'Retry-After': str(self.state.retry_after)})
+            return True
+        if self.state.error_rate and random.random() < self.state.error_rate:
+            self.state.count('errors')
+            self._send_json(self.state.error_status, {'ErrorType': 'GENERAL', 'Message': 'Stub server error'})
+            return True
+        return False
+
+    def _simulate_latency(self):
+        if self.state.latency_ms:
+            time.sleep(self.state.latency_ms / 1000.0)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stub/stats':
+            with self.state.lock:
+                payload = dict(self.state.counters, videos=len(self.state.videos))
+            self._send_json(200, payload)
+            return
+        self._simulate_latency()
+        if AUTH_PATH.match(path):
+            if self._throttled():
+                return
+            self.state.count('auth')
+            self._send_json(200, f"stub-token-{uuid.uuid4().hex}")
+            return
+        match = INDEX_PATH.match(path)
+        if match:
+            if self._throttled():
+                return
+            self.state.count('index')
+            self._send(200, self.state.index_body(match.group(1)))
+            return
+        self._send_json(404, {'ErrorType': 'NOT_FOUND'})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        received = self._drain_body()
+        self._simulate_latency()
+        if UPLOAD_PATH.match(path):
+            if self._throttled():
+                return
+            video_id = uuid.uuid4().hex[:10]
+            with self.state.lock:
+                self.state.videos[video_id] = time.time()
+            self.state.count('upload')
+            self.state.count('uploaded_bytes', received)
+            self._send_json(200, {'id': video_id, 'state': 'Uploaded'})
+            return
+        self._send_json(404, {'ErrorType': 'NOT_FOUND'})
+
+
+class StubIndexerServer:
+    """Stub sunucuyu arka planda bir thread içinde çalıştırır (benchmark ve elle test için)."""
+
+    def __init__(self, host='127.0.0.1', port=0, **state_options):
+        self.httpd = ThreadingHTTPServer((host, port), StubIndexerHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub_state = StubIndexerState(**state_options)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self):
+        return self.httpd.stub_state
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-indexer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yerel Azure Video Indexer stub sunucusu')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=int, default=0, help='Her isteğe eklenecek gecikme')
+    parser.add_argument('--processing-seconds', type=float, default=5, help='Yüklemeden Processed olana kadar geçen süre')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='429 dönen isteklerin oranı (0-1)')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 yanıtlarındaki Retry-After (sn)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='5xx dönen isteklerin oranı (0-1)')
+    parser.add_argument('--error-status', type=int, default=503, help='Hatalı yanıtların HTTP kodu')
+    parser.add_argument('--keywords', type=int, default=20)
+    parser.add_argument('--labels', type=int, default=20)
+    parser.add_argument('--transcript-lines', type=int, default=100)
+    args = parser.parse_args()
+
+    server = StubIndexerServer(
+        args.host, args.port, latency_ms=args.latency_ms, processing_seconds=args.processing_seconds,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+        error_rate=args.error_rate, error_status=args.error_status,
+        index_options={'keywords': args.keywords, 'labels': args.labels, 'transcript_lines': args.transcript_lines},
+    )
+    print(f"Stub Video Indexer {server.url} adresinde çalışıyor.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
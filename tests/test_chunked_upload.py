@@ -0,0 +1,159 @@
+"""Parçalı yükleme: bellek tavanından büyük bir dosya init/chunk/finalize ile alınıp
+StreamingMultipartBody ile stub Video Indexer'a gönderilirken RSS'in sabit kaldığını doğrular.
+
+MongoDB yerine mongomock, Azure yerine stub_indexer.StubIndexerServer kullanılır.
+"""
+import hashlib
+import importlib
+import io
+import os
+import resource
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_indexer import StubIndexerServer  # noqa: E402
+
+BLOCK_SIZE = 256 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024
+FILE_SIZE = 96 * 1024 * 1024
+# Tek bir parça (8 MiB) bile belleğe alınsaydı tepe RSS bu sınırı aşardı
+MAX_RSS_GROWTH = 4 * 1024 * 1024
+
+
+class ChunkReader:
+    """Dosyanın [offset, offset+length) penceresini dosya gibi sunar; gövde diskten akış olarak okunur."""
+
+    def __init__(self, f, offset, length):
+        self.f = f
+        self.offset = offset
+        self.length = length
+        self.f.seek(offset)
+
+    def tell(self):
+        return self.f.tell() - self.offset
+
+    def seek(self, position, whence=0):
+        base = {0: 0, 1: self.tell(), 2: self.length}[whence]
+        self.f.seek(self.offset + base + position)
+
+    def read(self, size=-1):
+        remaining = self.length - self.tell()
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.f.read(size)
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@pytest.fixture(scope='module')
+def stub():
+    server = StubIndexerServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope='module')
+def app_module(stub, tmp_path_factory):
+    # Ayarlar import sırasında okunur
+    os.environ.update({
+        'VIDEO_INDEXER_API_URL': stub.url, 'VIDEO_INDEXER_LOCATION': 'trial',
+        'VIDEO_INDEXER_ACCOUNT_ID': 'stub', 'VIDEO_INDEXER_SUBSCRIPTION_KEY': 'stub',
+        'MONGODB_CONNECTION_STRING': 'mongodb://mongomock', 'MONGODB_DB_NAME': 'test_chunked_upload',
+        'UPLOAD_SPOOL_DIR': str(tmp_path_factory.mktemp('spool')),
+        'UPLOAD_STREAM_BLOCK_SIZE': str(BLOCK_SIZE), 'UPLOAD_CHUNK_SIZE': str(CHUNK_SIZE),
+        'BACKGROUND_WORKERS_ENABLED': '0',
+    })
+    app = importlib.import_module('app')
+    app.MongoClient = mongomock.MongoClient
+    return app
+
+
+@pytest.fixture()
+def large_file(tmp_path):
+    path = tmp_path / 'large.mp4'
+    block = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for i in range(FILE_SIZE // len(block)):
+            f.write(i.to_bytes(8, 'big') + block[8:])
+    return path
+
+
+def test_large_chunked_upload_keeps_rss_flat(app_module, stub, large_file):
+    client = app_module.app.test_client()
+    response = client.post('/upload/init', json={'filename': 'large.mp4', 'size': FILE_SIZE,
+                                                 'mimetype': 'video/mp4'})
+    assert response.status_code == 201
+    session = response.get_json()
+
+    rss_before = peak_rss_bytes()
+    with open(large_file, 'rb') as f:
+        offset = 0
+        while offset < FILE_SIZE:
+            length = min(CHUNK_SIZE, FILE_SIZE - offset)
+            # Gövde dosyadan akış olarak okunur; test tarafı da parçayı belleğe almaz
+            response = client.put(f"{session['chunk_url']}?offset={offset}", input_stream=ChunkReader(f, offset, length),
+                                  content_length=length, content_type='application/octet-stream')
+            assert response.status_code == 200, response.get_json()
+            assert response.get_json()['offset'] == offset + length
+            offset += length
+
+    response = client.post(session['finalize_url'])
+    assert response.status_code == 202, response.get_json()
+
+    jobs = app_module.get_db_collection('upload_jobs')
+    job = app_module._claim_next_job(jobs)
+    assert os.path.getsize(job['spool_path']) == FILE_SIZE
+    app_module.process_upload_job(jobs, job)
+    rss_growth = peak_rss_bytes() - rss_before
+
+    job = jobs.find_one({'_id': job['_id']})
+    assert job['status'] == app_module.JOB_STATUS_DONE
+    assert job['upload_stats']['sent_size'] == FILE_SIZE
+    # Multipart başlık ve sonlandırıcısı dahil tüm gövde stub'a ulaştı
+    assert stub.state.counters['uploaded_bytes'] > FILE_SIZE
+    assert rss_growth < MAX_RSS_GROWTH, f'tepe RSS {rss_growth / 1024 / 1024:.1f} MiB arttı'
+
+
+def test_duplicate_chunk_put_does_not_grow_file(app_module):
+    client = app_module.app.test_client()
+    data = os.urandom(3 * BLOCK_SIZE)
+    session = client.post('/upload/init', json={'filename': 'small.mp4', 'size': len(data)}).get_json()
+
+    assert client.put(f"{session['chunk_url']}?offset=0", data=data[:BLOCK_SIZE]).status_code == 200
+    # Zaman aşımından sonra aynı parçanın tekrar gönderilmesi
+    response = client.put(f"{session['chunk_url']}?offset=0", data=data[:BLOCK_SIZE])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == BLOCK_SIZE
+    assert client.put(f"{session['chunk_url']}?offset={BLOCK_SIZE}", data=data[BLOCK_SIZE:]).status_code == 200
+
+    assert client.post(session['finalize_url']).status_code == 202
+
+
+def test_short_chunk_keeps_incremental_hash(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    data = os.urandom(3 * BLOCK_SIZE)
+    session = client.post('/upload/init', json={'filename': 'short.mp4', 'size': len(data)}).get_json()
+
+    # Bağlantı parçanın ortasında koptu: Content-Length 2 blok, gelen gövde daha kısa
+    response = client.put(f"{session['chunk_url']}?offset=0",
+                          input_stream=ChunkReader(io.BytesIO(data[:BLOCK_SIZE + 100]), 0, 2 * BLOCK_SIZE),
+                          content_length=2 * BLOCK_SIZE, content_type='application/octet-stream')
+    assert response.status_code == 400
+    assert response.get_json()['offset'] == BLOCK_SIZE + 100
+    response = client.put(f"{session['chunk_url']}?offset={BLOCK_SIZE + 100}", data=data[BLOCK_SIZE + 100:])
+    assert response.get_json()['offset'] == len(data)
+
+    # Hash parçalar yazılırken hesaplandı; finalize dosyayı tekrar okumamalı
+    monkeypatch.setattr(app_module, 'file_sha256', lambda path: pytest.fail('dosya yeniden okundu'))
+    assert client.post(session['finalize_url']).status_code == 202
+    upload = app_module.get_db_collection('chunked_uploads').find_one({'filename': 'short.mp4'})
+    assert upload['content_hash'] == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,65 @@
+"""InsightTimeline'ın MongoDB biçimi: sütunlar makineden bağımsız little-endian saklanır ve geri okunur."""
+import importlib
+import math
+import os
+import struct
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    os.environ.setdefault('BACKGROUND_WORKERS_ENABLED', '0')
+    return importlib.import_module('app')
+
+
+@pytest.fixture()
+def timeline(app_module):
+    timeline = app_module.InsightTimeline()
+    timeline.add('keyword', 'futbol', 0.75, 1.5, 3.0)
+    timeline.add('transcript', 'merhaba dünya', None, 0.0, 2.25)
+    timeline.add('keyword', 'futbol', 0.5, 70000.0, None)
+    timeline.add('scene', 'scene 1', None, None, None)
+    return timeline
+
+
+def test_document_columns_are_little_endian(app_module, timeline):
+    document = timeline.to_document()
+    assert document['dtypes'] == {'kind': '|u1', 'text': '<u4', 'confidence': '<f4', 'start': '<f4', 'end': '<f4'}
+    assert struct.unpack('<4I', document['text']) == (0, 1, 0, 2)
+    assert struct.unpack('<4f', document['start'])[:3] == (1.5, 0.0, 70000.0)
+    assert math.isnan(struct.unpack('<4f', document['end'])[2])
+    assert list(document['kind']) == [app_module.InsightTimeline.KINDS.index(kind)
+                                      for kind in ('keyword', 'transcript', 'keyword', 'scene')]
+
+
+def test_from_document_round_trip(app_module, timeline):
+    restored = app_module.InsightTimeline.from_document(timeline.to_document())
+    assert list(restored) == list(timeline)
+    assert restored.unique_texts('keyword') == ['futbol']
+    # Geri okunan zaman çizelgesine eklemeye devam edilebilir (metin kimlikleri korunur)
+    restored.add('keyword', 'futbol', 1.0, None, None)
+    assert len(restored.strings) == len(timeline.strings)
+
+
+def test_from_document_maps_reordered_kinds(app_module, timeline):
+    document = timeline.to_document()
+    kinds = list(reversed(document['kinds']))
+    document['kinds'] = kinds
+    document['kind'] = bytes(kinds.index(app_module.InsightTimeline.KINDS[code]) for code in document['kind'])
+    assert list(app_module.InsightTimeline.from_document(document)) == list(timeline)
+
+
+def test_from_document_rejects_unknown_format(app_module, timeline):
+    document = timeline.to_document()
+    del document['dtypes']
+    with pytest.raises(ValueError):
+        app_module.InsightTimeline.from_document(document)
+    document = timeline.to_document()
+    document['text'] = document['text'][:-4]
+    with pytest.raises(ValueError):
+        app_module.InsightTimeline.from_document(document)
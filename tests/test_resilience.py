@@ -0,0 +1,110 @@
+"""Dayanıklılık: Video Indexer istemcisinin 429/5xx davranışı (stub_indexer ile) ve MongoDB devre kesicisi
+(erişilemeyen bir bağlantı adresiyle).
+"""
+import importlib
+import os
+import sys
+import time
+
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_indexer import StubIndexerServer  # noqa: E402
+
+UNREACHABLE_MONGODB_URI = 'mongodb://127.0.0.1:1'
+BREAKER_RESET_SECONDS = 0.5
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    os.environ.setdefault('BACKGROUND_WORKERS_ENABLED', '0')
+    return importlib.import_module('app')
+
+
+@pytest.fixture()
+def stub_factory():
+    servers = []
+
+    def start(**state_options):
+        server = StubIndexerServer(**state_options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def make_client(app_module, stub, max_retries=2):
+    return app_module.VideoIndexerClient(stub.url, 'trial', 'stub', 'stub', max_retries=max_retries,
+                                         rate_per_second=1000)
+
+
+def test_throttled_requests_wait_for_retry_after(app_module, stub_factory):
+    stub = stub_factory(throttle_rate=1.0, retry_after=1)
+    client = make_client(app_module, stub, max_retries=2)
+
+    started = time.monotonic()
+    response = client.request('GET', '/Auth/trial/Accounts/stub/AccessToken')
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 429
+    assert stub.state.counters['throttled'] == 3
+    # İki tekrar denemenin her biri Retry-After (1 sn) kadar bekler; üstel geri çekilme çok daha kısa olurdu
+    assert elapsed >= 2.0
+
+
+def test_upload_is_not_retried_on_server_error(app_module, stub_factory, tmp_path):
+    stub = stub_factory(error_rate=1.0, error_status=503)
+    client = make_client(app_module, stub, max_retries=2)
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(os.urandom(64 * 1024))
+
+    body = app_module.StreamingMultipartBody(str(path), 'file', 'video.mp4', 'video/mp4')
+    response = client.upload_video('token', body, 'video.mp4')
+    assert response.status_code == 503
+    # Yükleme idempotent değil: Azure ilk isteği işlemiş olabilir, tekrar gönderilmez
+    assert stub.state.counters['errors'] == 1
+
+    # Karşılaştırma: idempotent Index isteği aynı hatada tekrar denenir
+    response = client.get_video_index('token', 'video')
+    assert response.status_code == 503
+    assert stub.state.counters['errors'] == 1 + 3
+
+
+def test_mongo_breaker_cycle_with_unreachable_server(app_module, monkeypatch):
+    breaker = app_module.CircuitBreaker(BREAKER_RESET_SECONDS)
+    monkeypatch.setattr(app_module, 'mongo_breaker', breaker)
+    monkeypatch.setattr(app_module, '_mongo_client', None)
+    monkeypatch.setattr(app_module, 'MONGODB_URI', UNREACHABLE_MONGODB_URI)
+    monkeypatch.setattr(app_module, 'MONGO_SERVER_SELECTION_TIMEOUT_MS', 200)
+    monkeypatch.setattr(app_module, 'MongoClient', pymongo.MongoClient)
+    assert breaker.state == breaker.CLOSED
+
+    # İlk istek sunucu seçimi zaman aşımına kadar bekler ve kesiciyi açar
+    assert app_module.get_mongo_client() is None
+    assert breaker.state == breaker.OPEN
+
+    # Açıkken bağlantı denenmez, istek hemen reddedilir
+    started = time.monotonic()
+    assert app_module.get_mongo_client() is None
+    assert time.monotonic() - started < 0.1
+    assert breaker.state == breaker.OPEN
+
+    # Süre dolunca tek bir deneme (half_open) yapılır; sunucu artık erişilebilir
+    time.sleep(BREAKER_RESET_SECONDS)
+    trial_states = []
+
+    def reachable_client(*args, **kwargs):
+        trial_states.append(breaker.state)
+        return mongomock.MongoClient()
+
+    monkeypatch.setattr(app_module, 'MongoClient', reachable_client)
+    assert app_module.get_mongo_client() is not None
+    assert trial_states == [breaker.HALF_OPEN]
+    assert breaker.state == breaker.CLOSED